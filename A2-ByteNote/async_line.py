@@ -0,0 +1,137 @@
+"""
+asyncio front end for a streaming ProcessingLine.
+
+Producers await add_transaction, which signs the transaction on an executor (threads by
+default, or e.g. a ProcessPoolExecutor) and then adds it to the line, so the event loop
+never runs the signing itself. The consumer uses `async for`: when the before-critical
+queue is empty it awaits the next add or close() instead of stopping.
+
+close() stops new adds at once, but adds already signing still go into the line: the line
+itself is only closed once the last of them has finished. Await aclose() to wait for that.
+
+Everything except the signing runs on the event loop thread, so no locks are needed.
+"""
+import asyncio
+
+from processing_line import NOT_READY, ProcessingLine, _compute_signature
+
+
+class AsyncProcessingLine:
+
+    def __init__(self, critical_transaction, executor=None, spill_segment_size=None) -> None:
+        """
+        :param executor: a concurrent.futures executor for signing, None for the loop's default.
+        :complexity:
+            Best & Worst: O(1)
+        """
+        self._line = ProcessingLine(critical_transaction, streaming=True, spill_segment_size=spill_segment_size)
+        self._executor = executor
+        self._changed = asyncio.Event()
+        # close() was called; the line is closed once no add is signing any more
+        self._closing = False
+        self._in_flight = 0
+
+    async def _sign(self, transaction) -> None:
+        """
+        Sign the transaction on the executor, unless it is already signed.
+        :complexity:
+            O(1) on the event loop; the O(n) signing runs on the executor.
+        """
+        if transaction.is_signed:
+            return
+        loop = asyncio.get_running_loop()
+        transaction.signature = await loop.run_in_executor(
+            self._executor,
+            _compute_signature,
+            transaction.timestamp,
+            transaction.from_user,
+            transaction.to_user,
+        )
+
+    async def add_transaction(self, transaction) -> None:
+        """
+        Sign the transaction off the loop, then add it to the line.
+        An add that got past the closed check is added even if close() is called while it signs.
+        :raises RuntimeError: if the line is closed.
+        :complexity:
+            O(1) on the event loop, see _sign.
+        """
+        if self._closing:
+            raise RuntimeError("The line is closed; no more transactions can be added.")
+        self._in_flight += 1
+        try:
+            await self._sign(transaction)
+            self._line.add_transaction(transaction)
+        finally:
+            self._in_flight -= 1
+            if self._closing and self._in_flight == 0:
+                self._line.close()
+            self._changed.set()
+
+    def close(self) -> None:
+        """
+        No more transactions will be added. Adds still awaiting their signature are not lost:
+        the line is closed when the last of them is added (see aclose).
+        :complexity:
+            Best & Worst: O(1)
+        """
+        self._closing = True
+        if self._in_flight == 0:
+            self._line.close()
+        self._changed.set()
+
+    async def aclose(self) -> None:
+        """
+        close(), then wait until every add in flight is in the line and the line is closed.
+        :complexity:
+            O(1) on the event loop, plus the time spent waiting.
+        """
+        self.close()
+        while not self._line.is_closed:
+            self._changed.clear()
+            await self._changed.wait()
+
+    @property
+    def is_closed(self) -> bool:
+        """ True once close() was called, even if adds in flight are still being added. """
+        return self._closing
+
+    def __aiter__(self):
+        """
+        :raises RuntimeError: if an iterator was already created.
+        :complexity:
+            Best & Worst: O(1)
+        """
+        return AsyncProcessingLineIterator(self)
+
+
+class AsyncProcessingLineIterator:
+
+    def __init__(self, line: AsyncProcessingLine) -> None:
+        self._line = line
+        self._iterator = iter(line._line)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        """
+        Return the next transaction in ProcessingLine order, signed.
+        While the line is open and nothing is ready, wait for the next add or close().
+        :raises StopAsyncIteration: when the line is closed and every transaction was returned.
+        :complexity:
+            O(1) on the event loop per transaction, plus the time spent waiting.
+        """
+        line = self._line
+        while True:
+            try:
+                transaction = self._iterator.poll()
+            except StopIteration:
+                raise StopAsyncIteration from None
+            if transaction is NOT_READY:
+                line._changed.clear()
+                await line._changed.wait()
+                continue
+            # the critical transaction never went through add_transaction
+            await line._sign(transaction)
+            return transaction
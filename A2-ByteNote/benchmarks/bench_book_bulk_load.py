@@ -0,0 +1,36 @@
+"""
+Rebuilding a ProcessingBook: storing every pair one by one versus ProcessingBook.from_sorted
+on the same pairs in signature order (as the old book iterates them).
+
+Run from the assignment folder:
+    python -m benchmarks.bench_book_bulk_load [keys]
+"""
+import sys
+import time
+
+from processing_book import ProcessingBook
+from processing_line import Transaction
+
+KEYS = 1_000_000
+
+
+if __name__ == "__main__":
+    keys = int(sys.argv[1]) if len(sys.argv) > 1 else KEYS
+    transactions = [Transaction(index, f"user{index % 1000}", "bank") for index in range(keys)]
+    for transaction in transactions:
+        transaction.sign()
+
+    start = time.perf_counter()
+    book = ProcessingBook()
+    for amount, transaction in enumerate(transactions):
+        book[transaction] = amount
+    incremental = time.perf_counter() - start
+
+    pairs = tuple(book)
+    start = time.perf_counter()
+    rebuilt = ProcessingBook.from_sorted(pairs)
+    bulk = time.perf_counter() - start
+
+    assert len(rebuilt) == len(book)
+    print(f"{keys} keys: one by one {incremental:.2f}s, from_sorted {bulk:.2f}s, "
+          f"{incremental / bulk:.1f}x faster")
@@ -0,0 +1,50 @@
+"""
+Insert and lookup time of ProcessingBook and RadixProcessingBook,
+on real signatures and on adversarial ones that share a 30-character prefix.
+
+Run from the assignment folder:
+    python -m benchmarks.bench_book_layouts [keys]
+"""
+import sys
+import time
+
+from processing_book import ProcessingBook
+from processing_line import Transaction
+from radix_book import RadixProcessingBook
+
+KEYS = 200_000
+
+
+def run(book_class, transactions) -> None:
+    book = book_class()
+    start = time.perf_counter()
+    for amount, transaction in enumerate(transactions):
+        book[transaction] = amount
+    inserted = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for transaction in transactions:
+        book[transaction]
+    looked_up = time.perf_counter() - start
+
+    count = len(transactions)
+    print(f"  {book_class.__name__:>21}: __setitem__ {inserted * 1e9 / count:6.0f} ns/key, "
+          f"__getitem__ {looked_up * 1e9 / count:6.0f} ns/key")
+
+
+if __name__ == "__main__":
+    keys = int(sys.argv[1]) if len(sys.argv) > 1 else KEYS
+    real = [Transaction(index, f"user{index % 1000}", "bank") for index in range(keys)]
+    for transaction in real:
+        transaction.sign()
+
+    adversarial = []
+    for index in range(keys):
+        transaction = Transaction(index, "attacker", "bank")
+        transaction.signature = "x" * 30 + f"{index:06d}"
+        adversarial.append(transaction)
+
+    for name, transactions in (("real signatures", real), ("30-character shared prefix", adversarial)):
+        print(f"{name}, {keys} keys:")
+        for book_class in (ProcessingBook, RadixProcessingBook):
+            run(book_class, transactions)
@@ -0,0 +1,35 @@
+"""
+Bytes used per stored transaction by ProcessingBook and RadixProcessingBook,
+as traced by tracemalloc while the book is filled.
+
+Run from the assignment folder:
+    python -m benchmarks.bench_book_memory [transactions]
+"""
+import gc
+import sys
+import tracemalloc
+
+from processing_book import ProcessingBook
+from processing_line import Transaction
+from radix_book import RadixProcessingBook
+
+TRANSACTIONS = 100_000
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else TRANSACTIONS
+    transactions = [Transaction(index, f"user{index % 1000}", "bank") for index in range(count)]
+    amounts = [1000 + index for index in range(count)]
+    for transaction in transactions:
+        transaction.sign()
+
+    for book_class in (ProcessingBook, RadixProcessingBook):
+        gc.collect()
+        tracemalloc.start()
+        book = book_class()
+        for transaction, amount in zip(transactions, amounts):
+            book[transaction] = amount
+        used, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{book_class.__name__:>21}: {used / count:6.1f} bytes per transaction")
+        del book
@@ -0,0 +1,50 @@
+"""
+ProcessingBook insert and lookup time at 1M keys, with the page of each signature character
+found through the code point table and, for comparison, by searching LEGAL_CHARACTERS.
+
+Run from the assignment folder:
+    python -m benchmarks.bench_book_page_index [keys]
+"""
+import sys
+import time
+
+import processing_book
+from processing_book import LEGAL_CHARACTERS, ProcessingBook
+from processing_line import Transaction
+
+KEYS = 1_000_000
+
+
+def scanning_page_of(character):
+    """ The lookup page_index used to do. """
+    return LEGAL_CHARACTERS.index(character)
+
+
+def run(name: str, transactions) -> None:
+    book = ProcessingBook()
+    start = time.perf_counter()
+    for amount, transaction in enumerate(transactions):
+        book[transaction] = amount
+    inserted = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for transaction in transactions:
+        book[transaction]
+    looked_up = time.perf_counter() - start
+
+    count = len(transactions)
+    print(f"{name:>7}: __setitem__ {inserted * 1e9 / count:6.0f} ns/key, "
+          f"__getitem__ {looked_up * 1e9 / count:6.0f} ns/key")
+
+
+if __name__ == "__main__":
+    keys = int(sys.argv[1]) if len(sys.argv) > 1 else KEYS
+    transactions = [Transaction(index, f"user{index % 1000}", "bank") for index in range(keys)]
+    for transaction in transactions:
+        transaction.sign()
+
+    table_page_of = processing_book._page_of
+    processing_book._page_of = scanning_page_of
+    run("scan", transactions)
+    processing_book._page_of = table_page_of
+    run("table", transactions)
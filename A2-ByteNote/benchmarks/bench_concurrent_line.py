@@ -0,0 +1,54 @@
+"""
+Throughput and lock contention of ConcurrentProcessingLine with 1 to 8 producer threads.
+
+Run from the assignment folder:
+    python -m benchmarks.bench_concurrent_line
+"""
+import threading
+import time
+
+from concurrent_line import ConcurrentProcessingLine
+from processing_line import Transaction
+
+TRANSACTIONS_PER_PRODUCER = 50_000
+
+
+def run(producers: int) -> None:
+    per_producer = TRANSACTIONS_PER_PRODUCER // producers
+    critical = Transaction(10**12, "critical", "critical")
+    batches = [
+        [Transaction(index, f"producer{producer}", "bank") for index in range(per_producer)]
+        for producer in range(producers)
+    ]
+    line = ConcurrentProcessingLine(critical, timeout=10)
+    consumed = 0
+
+    def produce(batch):
+        for transaction in batch:
+            line.add_transaction(transaction)
+
+    def consume():
+        nonlocal consumed
+        for _ in line:
+            consumed += 1
+
+    consumer = threading.Thread(target=consume)
+    threads = [threading.Thread(target=produce, args=(batch,)) for batch in batches]
+    start = time.perf_counter()
+    consumer.start()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    line.close()
+    consumer.join()
+    elapsed = time.perf_counter() - start
+
+    total = per_producer * producers
+    print(f"{producers} producers: {consumed} consumed, {total / elapsed:,.0f} adds/s, "
+          f"{line.contended_adds} contended adds ({100 * line.contended_adds / total:.1f}%)")
+
+
+if __name__ == "__main__":
+    for producers in (1, 2, 4, 8):
+        run(producers)
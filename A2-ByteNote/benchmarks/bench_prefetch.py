@@ -0,0 +1,75 @@
+"""
+Consumer-visible cost of ProcessingLineIterator with and without prefetching.
+
+The consumer takes each transaction, reads its signature, then spends CONSUMER_US on its own
+work: either in C code that releases the GIL (hashing a buffer, like writing to a file or a
+socket would) or in a Python loop that holds it. Reported per item: the time the consumer
+spent in next() plus reading the signature, and the total wall time.
+
+Run from the assignment folder:
+    python -m benchmarks.bench_prefetch [items]
+"""
+import hashlib
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from processing_line import ProcessingLine, Transaction
+
+ITEMS = 20_000
+CONSUMER_US = 20
+
+
+def calibrate_buffer() -> bytes:
+    """ A buffer whose sha256 takes about CONSUMER_US microseconds. """
+    size = 1 << 12
+    while True:
+        buffer = bytes(size)
+        start = time.perf_counter()
+        for _ in range(200):
+            hashlib.sha256(buffer).digest()
+        if (time.perf_counter() - start) / 200 * 1e6 >= CONSUMER_US:
+            return buffer
+        size *= 2 if size < 1 << 16 else 1.25
+        size = int(size)
+
+
+def busy_work() -> None:
+    end = time.perf_counter() + CONSUMER_US / 1e6
+    while time.perf_counter() < end:
+        pass
+
+
+def run(items: int, prefetch: int, work, executor) -> None:
+    critical = Transaction(items // 2, "bank", "bank")
+    line = ProcessingLine(critical)
+    for timestamp in range(items):
+        line.add_transaction(Transaction(timestamp, f"user{timestamp}", "bank"))
+
+    visible = 0.0
+    start = time.perf_counter()
+    line_iterator = line.iterator(prefetch=prefetch, executor=executor)
+    while True:
+        before = time.perf_counter()
+        try:
+            transaction = next(line_iterator)
+        except StopIteration:
+            break
+        transaction.signature
+        visible += time.perf_counter() - before
+        work()
+    total = time.perf_counter() - start
+    print(f"    prefetch={prefetch:<5} next()+signature {visible * 1e6 / items:6.1f} us/item, total {total:5.2f} s")
+
+
+if __name__ == "__main__":
+    items = int(sys.argv[1]) if len(sys.argv) > 1 else ITEMS
+    buffer = calibrate_buffer()
+    with ProcessPoolExecutor() as executor:
+        # start the workers before timing anything
+        executor.submit(busy_work).result()
+        for name, work in (("consumer releases the GIL", lambda: hashlib.sha256(buffer).digest()),
+                           ("consumer holds the GIL", busy_work)):
+            print(f"{items} items, {name}, {CONSUMER_US} us of work each:")
+            for prefetch in (0, 64, 1024):
+                run(items, prefetch, work, executor)
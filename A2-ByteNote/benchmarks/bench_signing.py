@@ -0,0 +1,64 @@
+"""
+Time to sign one transaction with (from_user, to_user) pairs that repeat, that cycle through
+many pairs, and that are new every time, for
+    - baseline: Transaction.sign as it was before the signature codec,
+    - current: Transaction.sign.
+
+A cache of per-pair hash state was tried here and removed: a hit saved a few hundred ns over
+hashing the whole text, and every miss (all of the cycling and unique workloads) cost more
+than that, so it only won on the repeated workload and by less than the run-to-run noise.
+
+Run from the assignment folder:
+    python -m benchmarks.bench_signing [transactions]
+"""
+import sys
+import time
+
+from processing_line import Transaction
+
+TRANSACTIONS = 200_000
+# Distinct pairs of the repeated and the cycling workloads
+REPEATED_PAIRS = 1000
+CYCLING_PAIRS = 12_288
+
+
+def baseline_sign(transaction):
+    """ Transaction.sign before the signature codec. """
+    value = 0
+    data = str(transaction.timestamp) + "|" + transaction.from_user + "|" + transaction.to_user
+    for char in data:
+        value = (value * 31 + ord(char)) % 36**36
+    sig_str = ""
+    while value > 0:
+        value, rem = divmod(value, 36)
+        sig_str = "0123456789abcdefghijklmnopqrstuvwxyz"[rem] + sig_str
+    if sig_str == "":
+        sig_str = "0"
+    if len(sig_str) < 36:
+        sig_str = ("0" * (36 - len(sig_str))) + sig_str
+    transaction.signature = sig_str
+
+
+def run(transactions, sign) -> float:
+    start = time.perf_counter()
+    for transaction in transactions:
+        sign(transaction)
+    elapsed = time.perf_counter() - start
+    return elapsed * 1e9 / len(transactions)
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else TRANSACTIONS
+    workloads = (
+        ("repeated", [Transaction(1_700_000_000 + index, f"user{index % REPEATED_PAIRS}", "merchant")
+                      for index in range(count)]),
+        ("cycling", [Transaction(1_700_000_000 + index, f"user{index % CYCLING_PAIRS}", "merchant")
+                     for index in range(count)]),
+        ("unique", [Transaction(1_700_000_000 + index, f"user{index}", f"merchant{index}")
+                    for index in range(count)]),
+    )
+    for workload, transactions in workloads:
+        baseline = run(transactions, baseline_sign)
+        current = run(transactions, Transaction.sign)
+        print(f"{workload:>8}: baseline {baseline:6.0f} ns, current {current:6.0f} ns "
+              f"({baseline / current:.2f}x baseline)")
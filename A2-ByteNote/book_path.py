@@ -0,0 +1,24 @@
+"""
+Path arrays for walking down the alternative book layout (radix_book) in a loop.
+
+A depth-first walk keeps, for every node on the path from the top, the node's cells and the
+next position to look at there, in two ArrayRs indexed by depth. They start out sized for a
+full-length signature and are doubled when a walk goes deeper, so a step allocates nothing.
+"""
+from data_structures.referential_array import ArrayR
+
+from processing_book import LEGAL_CHARACTERS
+
+# Nodes on the path of a full 36-character signature, plus the top one
+INITIAL_DEPTH = len(LEGAL_CHARACTERS) + 1
+
+
+def doubled(array: ArrayR) -> ArrayR:
+    """
+    Return an ArrayR twice as long as array, starting with its items.
+    :complexity: O(D), D = len(array).
+    """
+    bigger = ArrayR(2 * len(array))
+    for index in range(len(array)):
+        bigger[index] = array[index]
+    return bigger
@@ -0,0 +1,156 @@
+"""
+A ProcessingLine that several producer threads can feed while one consumer iterates.
+
+It runs the line in streaming mode (see ProcessingLine) behind one lock that is only held for
+the O(1) append/serve itself. Where a plain streaming line would have nothing ready, next()
+waits on a condition until a producer adds something or the line is closed, up to an optional
+timeout; poll() still returns NOT_READY without waiting. Producers only signal the condition when the consumer is actually waiting.
+
+contended_adds counts the adds that found the lock taken, to measure producer contention.
+"""
+import threading
+import time
+
+from data_structures.referential_array import ArrayR
+
+from processing_line import ProcessingLine, ProcessingLineIterator
+
+
+class ConcurrentProcessingLine(ProcessingLine):
+
+    def __init__(self, critical_transaction, timeout=None, spill_segment_size=None):
+        """
+        :param timeout: seconds the consumer waits for a new transaction before raising
+            TimeoutError, or None to wait until one arrives or the line is closed.
+        :complexity:
+            Best & Worst: O(1)
+        """
+        super().__init__(critical_transaction, streaming=True, spill_segment_size=spill_segment_size)
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+        self._consumer_waiting = False
+        self._timeout = timeout
+        self.contended_adds = 0
+
+    def iterator(self, prefetch=0, executor=None):
+        """
+        Create the (only) iterator of this line, a ConcurrentProcessingLineIterator.
+        Prefetching is not supported: it would take transactions off the line outside the lock.
+        :raises ValueError: if prefetch is not 0.
+        :raises RuntimeError: if an iterator was already created.
+        :complexity:
+            Best & Worst: O(1)
+        """
+        if prefetch != 0:
+            raise ValueError("A ConcurrentProcessingLine cannot prefetch.")
+        with self._lock:
+            if self._it_created:
+                raise RuntimeError("Only one iterator can be created.")
+            self._it_created = True
+            return ConcurrentProcessingLineIterator(self)
+
+    def add_transaction(self, transaction):
+        """
+        Safe to call from several threads at once.
+        :raises RuntimeError: if the line is closed.
+        :complexity:
+            Best & Worst: O(1), plus the time spent waiting for the lock.
+        """
+        if not self._lock.acquire(blocking=False):
+            self._lock.acquire()
+            self.contended_adds += 1
+        try:
+            super().add_transaction(transaction)
+            if self._consumer_waiting:
+                self._ready.notify()
+        finally:
+            self._lock.release()
+
+    def add_transactions(self, transactions):
+        """
+        Add a whole batch under a single acquisition of the lock.
+        :raises RuntimeError: if the line is closed.
+        :complexity:
+            Best & Worst: O(N), plus the time spent waiting for the lock.
+        """
+        if not self._lock.acquire(blocking=False):
+            self._lock.acquire()
+            self.contended_adds += 1
+        try:
+            super().add_transactions(transactions)
+            if self._consumer_waiting:
+                self._ready.notify()
+        finally:
+            self._lock.release()
+
+    def close(self):
+        """
+        No more transactions will be added; wakes the consumer so it can finish the line.
+        :complexity:
+            Best & Worst: O(1)
+        """
+        with self._lock:
+            super().close()
+            self._ready.notify_all()
+
+
+class ConcurrentProcessingLineIterator(ProcessingLineIterator):
+
+    @property
+    def may_run_dry(self):
+        """ Always False: next() waits for a producer instead. """
+        return False
+
+    def __next__(self):
+        """
+        Same order as ProcessingLineIterator, but while the line is open and nothing is
+        ready, block until a producer adds a transaction or closes the line.
+        :raises StopIteration: when the line is closed and every transaction was returned.
+        :raises TimeoutError: if the line's timeout passes without anything to return.
+        :complexity:
+            Best & Worst: O(1), plus the time spent waiting.
+        """
+        line = self._line
+        deadline = None if line._timeout is None else time.monotonic() + line._timeout
+        with line._lock:
+            while self._waits_for_producers():
+                remaining = None
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError("No transaction arrived before the timeout.")
+                line._consumer_waiting = True
+                try:
+                    line._ready.wait(remaining)
+                finally:
+                    line._consumer_waiting = False
+            return super().__next__()
+
+    def next_batch(self, size):
+        """
+        Like ProcessingLineIterator.next_batch, but only waits for the first transaction:
+        the rest of the batch is whatever is ready at that point, so a slow producer
+        never makes the consumer wait (or time out) holding transactions already taken.
+        :raises ValueError: if size is not positive.
+        :raises TimeoutError: if the line's timeout passes before the first transaction,
+            in which case nothing has been taken from the line.
+        :complexity:
+            Best & Worst: O(size * n), n the cost of one signature, plus the time spent waiting.
+        """
+        if size <= 0:
+            raise ValueError("Batch size must be positive.")
+        try:
+            first = next(self)
+        except StopIteration:
+            return ArrayR(0)
+        batch = ArrayR(size)
+        batch[0] = first
+        count = 1
+        with self._line._lock:
+            try:
+                while count < size and not self._waits_for_producers():
+                    batch[count] = ProcessingLineIterator.__next__(self)
+                    count += 1
+            except StopIteration:
+                pass
+        return self._finish_batch(batch, count)
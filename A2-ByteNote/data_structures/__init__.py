@@ -9,3 +9,7 @@ from .hash_table_separate_chaining import HashTableSeparateChaining
 from .hash_table_linear_probing import LinearProbeTable
 from .hash_table_double_hashing import DoubleHashingTable
 from .hash_table_quadratic_probing import QuadraticProbeTable
+from .hash_table_builtin_hash import BuiltinHashTable
+from .chunked_queue import ChunkedQueue
+from .chunked_stack import ChunkedStack
+from .array_min_heap import ArrayMinHeap
@@ -0,0 +1,116 @@
+from __future__ import annotations
+from typing import Generic, TypeVar
+
+from data_structures.referential_array import ArrayR
+
+T = TypeVar('T')
+
+
+class ArrayMinHeap(Generic[T]):
+    """ Min-heap of fixed capacity stored in an ArrayR.
+    The smallest item (by <) is at index 0; the children of index i are at 2i + 1 and 2i + 2.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        """
+        :complexity: O(capacity) to initialise the array.
+        """
+        if capacity < 0:
+            raise ValueError("Capacity cannot be negative.")
+        self.__array = ArrayR(capacity)
+        self.__length = 0
+
+    def add(self, item: T) -> None:
+        """ Adds an item to the heap.
+        :raises Exception: if the heap is full.
+        :complexity: O(log N) where N is the number of items in the heap.
+        """
+        if self.__length == len(self.__array):
+            raise Exception("Heap is full")
+        self.__array[self.__length] = item
+        self.__length += 1
+        self.__rise(self.__length - 1)
+
+    def peek(self) -> T:
+        """ Returns the smallest item without removing it.
+        :raises Exception: if the heap is empty.
+        :complexity: O(1)
+        """
+        if self.__length == 0:
+            raise Exception("Heap is empty")
+        return self.__array[0]
+
+    def get_min(self) -> T:
+        """ Removes and returns the smallest item.
+        :raises Exception: if the heap is empty.
+        :complexity: O(log N) where N is the number of items in the heap.
+        """
+        if self.__length == 0:
+            raise Exception("Heap is empty")
+        smallest = self.__array[0]
+        self.__length -= 1
+        if self.__length > 0:
+            self.__array[0] = self.__array[self.__length]
+            self.__array[self.__length] = None
+            self.__sink(0)
+        else:
+            self.__array[0] = None
+        return smallest
+
+    def replace_min(self, item: T) -> T:
+        """ Removes and returns the smallest item and adds item, with a single sink.
+        Cheaper than get_min followed by add.
+        :raises Exception: if the heap is empty.
+        :complexity: O(log N) where N is the number of items in the heap.
+        """
+        if self.__length == 0:
+            raise Exception("Heap is empty")
+        smallest = self.__array[0]
+        self.__array[0] = item
+        self.__sink(0)
+        return smallest
+
+    def __rise(self, index: int) -> None:
+        """ Moves the item at index up until its parent is not larger.
+        :complexity: O(log N)
+        """
+        array = self.__array
+        item = array[index]
+        while index > 0:
+            parent = (index - 1) // 2
+            if not item < array[parent]:
+                break
+            array[index] = array[parent]
+            index = parent
+        array[index] = item
+
+    def __sink(self, index: int) -> None:
+        """ Moves the item at index down until no child is smaller.
+        :complexity: O(log N)
+        """
+        array = self.__array
+        item = array[index]
+        while True:
+            child = 2 * index + 1
+            if child >= self.__length:
+                break
+            if child + 1 < self.__length and array[child + 1] < array[child]:
+                child += 1
+            if not array[child] < item:
+                break
+            array[index] = array[child]
+            index = child
+        array[index] = item
+
+    def is_empty(self) -> bool:
+        return self.__length == 0
+
+    def __len__(self) -> int:
+        return self.__length
+
+    def __str__(self) -> str:
+        items = ", ".join(str(self.__array[index]) for index in range(self.__length))
+        return f"<ArrayMinHeap [{items}]>"
+
+    def __repr__(self) -> str:
+        return str(self)
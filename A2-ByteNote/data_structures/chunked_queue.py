@@ -0,0 +1,124 @@
+from __future__ import annotations
+from typing import TypeVar
+
+from data_structures.abstract_queue import Queue
+from data_structures.node import Node
+from data_structures.referential_array import ArrayR
+
+T = TypeVar("T")
+
+
+class ChunkedQueue(Queue[T]):
+    """ Chunked Queue
+    The Queue ADT implemented as a linked chain of fixed-size ArrayR segments.
+    Items are written at the rear of the last segment and served from the front of the first,
+    so a node is only allocated once per segment instead of once per item.
+    The segment emptied last is kept aside and reused for the next one needed.
+    The raw arrays of the front and rear segments are cached to skip the ArrayR method calls.
+    """
+
+    DEFAULT_SEGMENT_SIZE = 256
+
+    def __init__(self, segment_size: int = DEFAULT_SEGMENT_SIZE) -> None:
+        """
+        :complexity: O(S) where S is the segment size.
+        """
+        if segment_size <= 0:
+            raise ValueError("Segment size must be positive.")
+        self.__segment_size = segment_size
+        self.__spare = None
+        self.clear()
+
+    def __new_segment(self) -> Node[ArrayR[T]]:
+        """ Returns an empty segment node, reusing the spare one if there is one.
+        :complexity: O(1) when the spare is reused, O(S) otherwise.
+        """
+        node = self.__spare
+        if node is None:
+            return Node(ArrayR(self.__segment_size))
+        self.__spare = None
+        node.link = None
+        return node
+
+    def append(self, item: T) -> None:
+        """ Adds an element to the rear of the queue.
+        :complexity: O(1) amortised, O(S) when a new segment has to be created.
+        """
+        if self.__rear_index == self.__segment_size:
+            node = self.__new_segment()
+            self.__rear.link = node
+            self.__rear = node
+            self.__rear_array = node.item.array
+            self.__rear_index = 0
+        self.__rear_array[self.__rear_index] = item
+        self.__rear_index += 1
+        self.__length += 1
+
+    def serve(self) -> T:
+        """ Deletes and returns the element at the queue's front.
+        :raises Exception: if the queue is empty
+        :complexity: O(1)
+        """
+        if self.__length == 0:
+            raise Exception("Queue is empty")
+
+        segment = self.__front_array
+        item = segment[self.__front_index]
+        segment[self.__front_index] = None
+        self.__front_index += 1
+        self.__length -= 1
+
+        if self.__length == 0:
+            # Reuse the segment from the start, there is nothing behind it
+            self.__front_index = 0
+            self.__rear_index = 0
+        elif self.__front_index == self.__segment_size:
+            emptied = self.__front
+            self.__front = emptied.link
+            self.__front_array = self.__front.item.array
+            self.__front_index = 0
+            self.__spare = emptied
+        return item
+
+    def peek(self) -> T:
+        """ Returns the element at the queue's front without deleting it.
+        :raises Exception: if the queue is empty
+        :complexity: O(1)
+        """
+        if self.__length == 0:
+            raise Exception("Queue is empty")
+        return self.__front_array[self.__front_index]
+
+    def clear(self) -> None:
+        """ Clears all elements from the queue.
+        :complexity: O(S) where S is the segment size.
+        """
+        self.__front = self.__new_segment()
+        self.__rear = self.__front
+        self.__front_array = self.__front.item.array
+        self.__rear_array = self.__front_array
+        self.__front_index = 0
+        self.__rear_index = 0
+        self.__length = 0
+
+    def __iter__(self):
+        """ Yields the elements from front to rear without removing them.
+        :complexity: O(N) for the whole iteration.
+        """
+        node = self.__front
+        index = self.__front_index
+        for _ in range(self.__length):
+            if index == self.__segment_size:
+                node = node.link
+                index = 0
+            yield node.item[index]
+            index += 1
+
+    def __len__(self) -> int:
+        """ Returns the number of elements in the queue. """
+        return self.__length
+
+    def __str__(self) -> str:
+        """ Returns a string representation of the queue."""
+        items = ", ".join(str(item) for item in self)
+        return f"<ChunkedQueue [{items}]>"
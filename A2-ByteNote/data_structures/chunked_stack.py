@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+from data_structures.abstract_stack import Stack, T
+from data_structures.node import Node
+from data_structures.referential_array import ArrayR
+
+
+class ChunkedStack(Stack[T]):
+    """ Implementation of a stack as a linked chain of fixed-size ArrayR segments.
+    The top segment is filled from index 0 upwards and links to the segment below it,
+    so a node is only allocated once per segment instead of once per item.
+    The segment emptied last is kept aside, so pushing and popping around a segment
+    boundary does not keep allocating.
+    The raw array of the top segment is cached to skip the ArrayR method calls.
+    """
+
+    DEFAULT_SEGMENT_SIZE = 256
+
+    def __init__(self, segment_size: int = DEFAULT_SEGMENT_SIZE) -> None:
+        """
+        :complexity: O(S) where S is the segment size.
+        """
+        if segment_size <= 0:
+            raise ValueError("Segment size must be positive.")
+        self.__segment_size = segment_size
+        self.__spare = None
+        self.clear()
+
+    def push(self, item: T) -> None:
+        """ Pushes an element to the top of the stack.
+        :complexity: O(1) amortised, O(S) when a new segment has to be created.
+        """
+        if self.__top_index == self.__segment_size:
+            node = self.__spare
+            if node is None:
+                node = Node(ArrayR(self.__segment_size))
+            else:
+                self.__spare = None
+            node.link = self.__top
+            self.__top = node
+            self.__top_array = node.item.array
+            self.__top_index = 0
+        self.__top_array[self.__top_index] = item
+        self.__top_index += 1
+        self.__length += 1
+
+    def pop(self) -> T:
+        """ Pops the element at the top of the stack.
+        :complexity: O(1)
+        :raises Exception: if the stack is empty
+        """
+        if self.__length == 0:
+            raise Exception('Stack is empty')
+
+        if self.__top_index == 0:
+            emptied = self.__top
+            self.__top = emptied.link
+            self.__top_array = self.__top.item.array
+            self.__top_index = self.__segment_size
+            emptied.link = None
+            self.__spare = emptied
+
+        self.__top_index -= 1
+        segment = self.__top_array
+        item = segment[self.__top_index]
+        segment[self.__top_index] = None
+        self.__length -= 1
+        return item
+
+    def peek(self) -> T:
+        """ Returns the element at the top, without popping it from stack.
+        :complexity: O(1)
+        :raises Exception: if the stack is empty
+        """
+        if self.__length == 0:
+            raise Exception('Stack is empty')
+        if self.__top_index == 0:
+            return self.__top.link.item[self.__segment_size - 1]
+        return self.__top_array[self.__top_index - 1]
+
+    def clear(self) -> None:
+        """ Resets the stack to an empty state.
+        :complexity: O(S) where S is the segment size.
+        """
+        self.__top = Node(ArrayR(self.__segment_size))
+        self.__top_array = self.__top.item.array
+        self.__top_index = 0
+        self.__length = 0
+
+    def __iter__(self):
+        """ Yields the elements from top to bottom (pop order) without removing them.
+        :complexity: O(N) for the whole iteration.
+        """
+        node = self.__top
+        index = self.__top_index
+        for _ in range(self.__length):
+            if index == 0:
+                node = node.link
+                index = self.__segment_size
+            index -= 1
+            yield node.item[index]
+
+    def __len__(self) -> int:
+        """ Returns the number of elements in the stack.
+        :complexity: O(1)
+        """
+        return self.__length
+
+    def __str__(self) -> str:
+        """ Returns a string representation of the stack."""
+        stack_str = ""
+        for item in self:
+            if stack_str == "":
+                stack_str = str(item)
+            else:
+                stack_str = str(item) + ", " + stack_str
+        return f"<ChunkedStack [{stack_str}]>"
@@ -0,0 +1,198 @@
+from __future__ import annotations
+from typing import Generic, Tuple, TypeVar
+from data_structures.referential_array import ArrayR
+
+K = TypeVar('K')
+V = TypeVar('V')
+
+# Number of slots of a new table, a power of two
+INITIAL_SIZE = 16
+
+
+class BuiltinHashTable(Generic[K, V]):
+    """
+    Linear probing hash table keyed on Python's own hash() of the key, so any hashable key can be
+    used (e.g. a tuple of strings). Strings and tuples of strings cache their hash, so hashing a key
+    seen before is O(1), where the course hash function walks every character.
+
+    The table owns its ArrayR of slots. Its size is a power of two, doubled whenever the table is
+    more than half full, so unlike the course tables (which stop at the end of their list of prime
+    sizes) it keeps growing for as long as there is memory.
+    It is not a HashTable subclass: DunderProtected runs every attribute read of a HashTable
+    through Python code, which costs more than the probing itself.
+
+    Each slot holds None or a (key, value) tuple that is only ever replaced as a whole, and growing
+    builds a new array before switching to it. So find() can run without a lock next to one writer
+    that only adds keys: it sees each slot either before or after the write.
+
+    Unless stated otherwise, all methods have O(1) complexity (amortised, plus hashing the key),
+    assuming the keys hash evenly. Worst case O(N), N is the table size.
+    """
+    __slots__ = ("__array", "__length")
+
+    def __init__(self) -> None:
+        self.__array = ArrayR(INITIAL_SIZE)
+        self.__length = 0
+
+    def hash(self, key: K) -> int:
+        """
+        :complexity: O(1) once the key's hash is cached, O(K) the first time, K the size of the key.
+        """
+        return hash(key) & (self.table_size - 1)
+
+    @property
+    def table_size(self) -> int:
+        return len(self.__array)
+
+    def find(self, key: K, default: V | None = None) -> V | None:
+        """
+        Return the value stored for key, or default if there is none.
+        Probes the ctypes array under the ArrayR directly, as this is the lookup hot paths use.
+        """
+        slots = self.__array.array
+        mask = len(slots) - 1
+        position = hash(key) & mask
+        while True:
+            item = slots[position]
+            if item is None:
+                return default
+            if item[0] == key:
+                return item[1]
+            position = (position + 1) & mask
+
+    def __getitem__(self, key: K) -> V:
+        """
+        :raises KeyError: when the key is not in the table.
+        """
+        slots = self.__array.array
+        mask = len(slots) - 1
+        position = hash(key) & mask
+        while True:
+            item = slots[position]
+            if item is None:
+                raise KeyError(key)
+            if item[0] == key:
+                return item[1]
+            position = (position + 1) & mask
+
+    def __setitem__(self, key: K, data: V) -> None:
+        """
+        Store data under key, replacing the value stored before if there is one.
+        :complexity: O(1) amortised over the doubling of the table.
+        """
+        slots = self.__array.array
+        mask = len(slots) - 1
+        position = hash(key) & mask
+        while True:
+            item = slots[position]
+            if item is None:
+                break
+            if item[0] == key:
+                slots[position] = (key, data)
+                return
+            position = (position + 1) & mask
+        slots[position] = (key, data)
+        self.__length += 1
+        if 2 * self.__length > len(slots):
+            self.__grow()
+
+    def __delitem__(self, key: K) -> None:
+        """
+        Remove key, moving back the items after it in its cluster so that no probe stops early.
+        Not safe next to a find() without a lock, as an item can be moved past a running probe.
+        :complexity: O(1) plus the length of the cluster after the key.
+        :raises KeyError: when the key is not in the table.
+        """
+        slots = self.__array.array
+        mask = len(slots) - 1
+        position = hash(key) & mask
+        while True:
+            item = slots[position]
+            if item is None:
+                raise KeyError(key)
+            if item[0] == key:
+                break
+            position = (position + 1) & mask
+        self.__length -= 1
+        gap = position
+        position = (position + 1) & mask
+        while slots[position] is not None:
+            item = slots[position]
+            home = hash(item[0]) & mask
+            # the item can fill the gap if the gap lies on its probe path (home -> position)
+            if (position - home) & mask >= (position - gap) & mask:
+                slots[gap] = item
+                gap = position
+            position = (position + 1) & mask
+        slots[gap] = None
+
+    def __grow(self) -> None:
+        """
+        Move every item to an array twice the size.
+        :complexity: O(N), N is the table size.
+        """
+        old = self.__array.array
+        bigger = ArrayR(2 * len(old))
+        slots = bigger.array
+        mask = len(slots) - 1
+        for item in old:
+            if item is not None:
+                position = hash(item[0]) & mask
+                while slots[position] is not None:
+                    position = (position + 1) & mask
+                slots[position] = item
+        self.__array = bigger
+
+    def __contains__(self, key: K) -> bool:
+        return self.find(key, _MISSING) is not _MISSING
+
+    def items(self) -> ArrayR[Tuple[K, V]]:
+        """
+        :complexity: O(N), N is the table size.
+        """
+        result = ArrayR(self.__length)
+        count = 0
+        for item in self.__array.array:
+            if item is not None:
+                result[count] = item
+                count += 1
+        return result
+
+    def keys(self) -> ArrayR[K]:
+        """
+        :complexity: O(N), N is the table size.
+        """
+        result = self.items()
+        for index in range(len(result)):
+            result[index] = result[index][0]
+        return result
+
+    def values(self) -> ArrayR[V]:
+        """
+        :complexity: O(N), N is the table size.
+        """
+        result = self.items()
+        for index in range(len(result)):
+            result[index] = result[index][1]
+        return result
+
+    def is_empty(self) -> bool:
+        return self.__length == 0
+
+    def __len__(self) -> int:
+        return self.__length
+
+    def __str__(self) -> str:
+        result = ""
+        for item in self.__array.array:
+            if item is not None:
+                (key, value) = item
+                result += "(" + str(key) + "," + str(value) + ")\n"
+        return result
+
+    def __repr__(self) -> str:
+        return str(self)
+
+
+# Default of find() in __contains__, as None can be a stored value
+_MISSING = object()
@@ -0,0 +1,225 @@
+"""
+Streaming ingestion of transactions from CSV and JSON-lines files.
+
+The readers are generators: the file is read buffer_size bytes' worth of lines at a time
+and each row is turned into a (Transaction, amount) pair as it is consumed, so memory stays
+bounded by the buffer no matter how large the file is. amount is None when the row has none.
+
+Columns / keys: timestamp, from_user, to_user and optionally amount.
+A CSV file without a header row must list them in that order.
+
+Pass an IngestionStats to a reader to count rows and see the rows/second rate,
+optionally with a progress callback every so many rows.
+
+User names are interned in a UserRegistry, a new one per run unless one is passed in, so the
+transactions of one file share one string object per user and can compare users by id.
+"""
+import csv
+import json
+import time
+
+from processing_line import Transaction
+from user_registry import UserRegistry
+
+FIELDS = ("timestamp", "from_user", "to_user", "amount")
+DEFAULT_BUFFER_SIZE = 1 << 20
+
+
+class IngestionStats:
+    """
+    Row counter and throughput meter for one ingestion run.
+    All methods have O(1) complexity.
+    """
+
+    def __init__(self, progress=None, progress_every: int = 100_000) -> None:
+        """
+        :param progress: called with this object every progress_every rows (e.g. print).
+        """
+        if progress_every <= 0:
+            raise ValueError("progress_every must be positive.")
+        self.__progress = progress
+        self.__progress_every = progress_every
+        self.__rows = 0
+        self.__started = time.perf_counter()
+        self.__finished = None
+
+    def record_row(self) -> None:
+        self.__rows += 1
+        if self.__progress is not None and self.__rows % self.__progress_every == 0:
+            self.__progress(self)
+
+    def finish(self) -> None:
+        """ Stop the clock; later reads of elapsed use the finishing time. """
+        if self.__finished is None:
+            self.__finished = time.perf_counter()
+
+    @property
+    def rows(self) -> int:
+        return self.__rows
+
+    @property
+    def elapsed(self) -> float:
+        """ Seconds since the stats were created, until finish() if it was called. """
+        end = time.perf_counter() if self.__finished is None else self.__finished
+        return end - self.__started
+
+    @property
+    def rows_per_second(self) -> float:
+        elapsed = self.elapsed
+        return self.__rows / elapsed if elapsed > 0 else 0.0
+
+    def __str__(self) -> str:
+        return f"<IngestionStats {self.__rows} rows in {self.elapsed:.3f}s, {self.rows_per_second:.0f} rows/s>"
+
+    def __repr__(self) -> str:
+        return str(self)
+
+
+def _buffered_lines(file, buffer_size: int):
+    """
+    Yield the lines of a text file, reading about buffer_size bytes of lines per call.
+    :complexity: O(B) per call to readlines, B = buffer_size; O(F) overall for a file of F bytes.
+    """
+    while True:
+        lines = file.readlines(buffer_size)
+        if not lines:
+            return
+        yield from lines
+
+
+def _integer(value, field: str) -> int:
+    """
+    Convert one timestamp or amount field to an int. Text must spell an integer, and a JSON
+    number must have an integral value: 2.0 is taken as 2, 1.9 or true is rejected.
+    :raises ValueError: if the value is not an integer.
+    """
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError(f"{field} must be an integer, got {value!r}.")
+    if isinstance(value, float):
+        if not value.is_integer():
+            raise ValueError(f"{field} must be an integer, got {value!r}.")
+        return int(value)
+    if isinstance(value, str):
+        try:
+            return int(value)
+        except ValueError:
+            raise ValueError(f"{field} must be an integer, got {value!r}.") from None
+    return value
+
+
+def _make_row(timestamp, from_user, to_user, amount, registry):
+    """
+    Build the (Transaction, amount) pair of one row, checking and converting its fields.
+    :raises ValueError: if the timestamp or amount is not an integer, or a user name is not a string.
+    """
+    for field, name in (("from_user", from_user), ("to_user", to_user)):
+        if not isinstance(name, str):
+            raise ValueError(f"{field} must be a string, got {name!r}.")
+    if amount is not None and amount != "":
+        amount = _integer(amount, "amount")
+    else:
+        amount = None
+    return Transaction(_integer(timestamp, "timestamp"), from_user, to_user, registry), amount
+
+
+def read_csv(path, has_header: bool = True, buffer_size: int = DEFAULT_BUFFER_SIZE, stats: IngestionStats | None = None,
+             registry: UserRegistry | None = None):
+    """
+    Yield a (Transaction, amount) pair for every row of a CSV file.
+    :param registry: where the user names are interned, defaults to a new one for this run.
+    :raises ValueError: if the header lacks a required column, or a row is too short or has a
+        malformed field.
+    :complexity: O(F), F is the size of the file.
+    """
+    if registry is None:
+        registry = UserRegistry()
+    with open(path, newline="", encoding="utf-8") as file:
+        rows = csv.reader(_buffered_lines(file, buffer_size))
+        positions = (0, 1, 2, 3)
+        if has_header:
+            header = next(rows, None)
+            if header is None:
+                return
+            header = tuple(name.strip() for name in header)
+            for field in FIELDS[:3]:
+                if field not in header:
+                    raise ValueError(f"{path}: missing column {field!r}.")
+            positions = tuple(header.index(field) if field in header else None for field in FIELDS)
+        timestamp_at, from_at, to_at, amount_at = positions
+        needed = max(timestamp_at, from_at, to_at) + 1
+        for row in rows:
+            if not row:
+                continue
+            if len(row) < needed:
+                raise ValueError(f"{path}:{rows.line_num}: expected at least {needed} fields, got {len(row)}.")
+            amount = row[amount_at] if amount_at is not None and amount_at < len(row) else None
+            try:
+                pair = _make_row(row[timestamp_at], row[from_at], row[to_at], amount, registry)
+            except ValueError as error:
+                raise ValueError(f"{path}:{rows.line_num}: {error}") from None
+            if stats is not None:
+                stats.record_row()
+            yield pair
+    if stats is not None:
+        stats.finish()
+
+
+def read_jsonl(path, buffer_size: int = DEFAULT_BUFFER_SIZE, stats: IngestionStats | None = None,
+               registry: UserRegistry | None = None):
+    """
+    Yield a (Transaction, amount) pair for every JSON object line of a file. Blank lines are skipped.
+    :param registry: where the user names are interned, defaults to a new one for this run.
+    :raises ValueError: if a line is not valid JSON, not an object, lacks a required key or has a
+        malformed field.
+    :complexity: O(F), F is the size of the file.
+    """
+    if registry is None:
+        registry = UserRegistry()
+    with open(path, encoding="utf-8") as file:
+        for number, line in enumerate(_buffered_lines(file, buffer_size), start=1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError(f"{path}:{number}: expected a JSON object, got {type(record).__name__}.")
+            try:
+                pair = _make_row(
+                    record["timestamp"], record["from_user"], record["to_user"], record.get("amount"), registry
+                )
+            except KeyError as missing:
+                raise ValueError(f"{path}:{number}: missing key {missing}.") from None
+            except ValueError as error:
+                raise ValueError(f"{path}:{number}: {error}") from None
+            if stats is not None:
+                stats.record_row()
+            yield pair
+    if stats is not None:
+        stats.finish()
+
+
+def ingest_into_line(rows, line) -> int:
+    """
+    Add the transaction of every (Transaction, amount) row to a ProcessingLine. Amounts are ignored.
+    Returns the number of transactions added.
+    :complexity: O(N) add_transaction calls.
+    """
+    count = 0
+    for transaction, _ in rows:
+        line.add_transaction(transaction)
+        count += 1
+    return count
+
+
+def ingest_into_book(rows, book) -> int:
+    """
+    Store every (Transaction, amount) row in a ProcessingBook. Returns the number of rows stored.
+    :raises ValueError: if a row has no amount.
+    :complexity: O(N * L), L is the signature length.
+    """
+    count = 0
+    for transaction, amount in rows:
+        if amount is None:
+            raise ValueError("A ProcessingBook needs an amount for every transaction.")
+        book[transaction] = amount
+        count += 1
+    return count
@@ -0,0 +1,118 @@
+"""
+Checkpoint and resume for processing line iterators.
+
+A checkpoint is a binary transaction file (see transaction_file) holding the transactions
+that were still to be returned, in the order they would have been returned. The stage of the
+line is implied by that order, so resuming never rebuilds the queue, the stack or the critical
+split: a ResumedLineIterator just reads the file from the front through mmap, decoding records
+as they are needed. Signatures already computed are saved too, so they are not computed again.
+
+Checkpoints are written to a temporary file first and then renamed over the target,
+so a crash while writing leaves the previous checkpoint intact.
+"""
+import os
+
+from transaction_file import TransactionFile, TransactionFileWriter
+
+
+def write_checkpoint(path, transactions) -> int:
+    """
+    Atomically replace the checkpoint at path with the given transactions, in order.
+    Returns the number of transactions saved.
+    :complexity: O(R), R transactions.
+    """
+    partial = f"{path}.partial"
+    with TransactionFileWriter(partial) as writer:
+        writer.write_all(transactions)
+        count = len(writer)
+    os.replace(partial, path)
+    return count
+
+
+class ResumedLineIterator:
+    """
+    Iterator over the transactions saved in a checkpoint.
+    Unless stated otherwise, all methods have O(1) complexity.
+    """
+
+    def __init__(self, path) -> None:
+        """
+        :complexity: O(U), U is the total length of the user names in the checkpoint.
+        """
+        self.__records = TransactionFile(path)
+        self.__position = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        """
+        :raises StopIteration: when every saved transaction was returned.
+        """
+        if self.__position == len(self.__records):
+            self.close()
+            raise StopIteration
+        transaction = self.__records[self.__position]
+        self.__position += 1
+        return transaction
+
+    def remaining(self):
+        """
+        Yield the transactions still to be returned, without consuming them.
+        :complexity: O(R) for the whole iteration.
+        """
+        yield from self.__records[self.__position:]
+
+    def checkpoint(self, path):
+        """
+        Save the transactions still to be returned, like ProcessingLineIterator.checkpoint.
+        path may be the checkpoint this iterator is reading: the new file replaces it by
+        rename, and the old contents stay mapped until close().
+        :complexity: O(R)
+        """
+        return write_checkpoint(path, self.remaining())
+
+    def close(self) -> None:
+        """ Unmap the checkpoint file. """
+        self.__records.close()
+
+    def __enter__(self) -> "ResumedLineIterator":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        """ Number of transactions left. """
+        return len(self.__records) - self.__position
+
+
+def resume(path) -> ResumedLineIterator:
+    """
+    Carry on from a checkpoint written by ProcessingLineIterator.checkpoint.
+    """
+    return ResumedLineIterator(path)
+
+
+def checkpointing(line_iterator, path, every: int):
+    """
+    Yield from a ProcessingLineIterator (or ResumedLineIterator), saving a checkpoint of what
+    is left every `every` transactions. A checkpoint is written when the consumer asks for the
+    next transaction, so everything returned before it counts as done.
+    Each checkpoint rewrites the whole remainder, so over N transactions about N / every
+    checkpoints write O(N) records each: O(N^2 / every) in total. Pick `every` as a fraction
+    of N (every = N / k costs O(k * N)) rather than a constant.
+    :complexity: O(1) per transaction, plus O(R) per checkpoint, O(N^2 / every) overall.
+    """
+    if every <= 0:
+        raise ValueError("every must be positive.")
+    count = 0
+    while True:
+        if count > 0 and count % every == 0:
+            line_iterator.checkpoint(path)
+        try:
+            transaction = next(line_iterator)
+        except StopIteration:
+            return
+        count += 1
+        yield transaction
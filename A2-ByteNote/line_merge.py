@@ -0,0 +1,72 @@
+"""
+Lazy k-way merge of transaction streams that are each already in timestamp order.
+
+The merge keeps one pending transaction per input in a min-heap keyed on
+(timestamp, input number), so ties come out in input order and transactions are never
+compared themselves. Each step takes the smallest, then pulls the next transaction of the
+same input, so only k transactions are held at any time.
+
+A source is only dropped once its iterator raises StopIteration, so every input must either be
+finished when it runs out or wait for more: a plain streaming ProcessingLine that is still open
+is rejected, while a ConcurrentProcessingLine (whose next() waits for its producers) is fine.
+"""
+from data_structures.array_min_heap import ArrayMinHeap
+from data_structures.referential_array import ArrayR
+
+
+class MergedTransactionIterator:
+
+    def __init__(self, sources) -> None:
+        """
+        :param sources: a sequence (ArrayR, list, ...) of iterables of Transaction, for
+            example ProcessingLineIterators, each in non-decreasing timestamp order.
+        :raises ValueError: if a source is an open streaming ProcessingLine, or its iterator,
+            whose next() could run out of transactions before the line is finished.
+        :complexity: O(k log k), k is the number of sources, to take the first of each.
+        """
+        self.__iterators = ArrayR(len(sources))
+        self.__heap = ArrayMinHeap(len(sources))
+        for index in range(len(sources)):
+            iterator = iter(sources[index])
+            if getattr(iterator, "may_run_dry", False):
+                raise ValueError(f"Source {index} is an open streaming line; close it before merging.")
+            self.__iterators[index] = iterator
+        for index in range(len(sources)):
+            self.__pull(index)
+
+    def __pull(self, index: int) -> None:
+        """
+        Add the next transaction of source index to the heap, if it has one.
+        :complexity: O(log k)
+        """
+        try:
+            transaction = next(self.__iterators[index])
+        except StopIteration:
+            return
+        self.__heap.add((transaction.timestamp, index, transaction))
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        """
+        Return the transaction with the smallest timestamp among all sources.
+        :raises StopIteration: when every source is exhausted.
+        :complexity:
+            Best & Worst: O(log k), k is the number of sources.
+        """
+        heap = self.__heap
+        if heap.is_empty():
+            raise StopIteration
+        _, index, transaction = heap.peek()
+        try:
+            following = next(self.__iterators[index])
+        except StopIteration:
+            heap.get_min()
+        else:
+            heap.replace_min((following.timestamp, index, following))
+        return transaction
+
+    def __len__(self) -> int:
+        """ Number of sources that still have transactions. """
+        return len(self.__heap)
@@ -0,0 +1,211 @@
+"""
+Instrumentation for ProcessingLine iteration.
+
+A line created with ProcessingLine(..., instrument=True) keeps a LineStats and hands out an
+InstrumentedProcessingLineIterator, which records into it:
+- how many transactions came out of each stage (before, critical, after),
+- how long signing took, per transaction, as a histogram,
+- how long each next() took (queue work, signing, and waiting on prefetched signatures),
+- how long the consumer spent between next() calls,
+- the highest depth seen of the before-critical queue and after-critical stack,
+- items per second from the first next() to the last.
+
+Lines created without it run the plain ProcessingLineIterator, which has no recording code at all.
+as_dict() exports everything as plain ints and floats, ready for json or a metrics system.
+"""
+from data_structures.referential_array import ArrayR
+
+STAGES = ("before", "critical", "after")
+
+
+def _zeros(length: int) -> ArrayR:
+    """
+    An ArrayR of length counters, all 0.
+    :complexity: O(length)
+    """
+    counts = ArrayR(length)
+    for index in range(length):
+        counts[index] = 0
+    return counts
+
+
+class LatencyHistogram:
+    """
+    Durations in nanoseconds, counted in power-of-two buckets: bucket b holds durations
+    d with 2 ** (b - 1) <= d < 2 ** b (bucket 0 holds 0). The last bucket takes everything longer.
+    All methods have O(1) complexity, except those over the buckets, which are O(B).
+    """
+
+    BUCKETS = 48
+
+    def __init__(self) -> None:
+        self.__counts = _zeros(LatencyHistogram.BUCKETS)
+        self.__count = 0
+        self.__total = 0
+        self.__max = 0
+
+    def record(self, nanoseconds: int) -> None:
+        bucket = nanoseconds.bit_length()
+        if bucket >= LatencyHistogram.BUCKETS:
+            bucket = LatencyHistogram.BUCKETS - 1
+        self.__counts[bucket] += 1
+        self.__count += 1
+        self.__total += nanoseconds
+        if nanoseconds > self.__max:
+            self.__max = nanoseconds
+
+    @property
+    def count(self) -> int:
+        return self.__count
+
+    @property
+    def total_ns(self) -> int:
+        return self.__total
+
+    @property
+    def mean_ns(self) -> float:
+        return self.__total / self.__count if self.__count else 0.0
+
+    @property
+    def max_ns(self) -> int:
+        return self.__max
+
+    def percentile(self, fraction: float) -> int:
+        """
+        Upper bound in nanoseconds of the bucket holding the given fraction (0 to 1) of durations.
+        :complexity: O(B), B is the number of buckets.
+        """
+        if not 0 <= fraction <= 1:
+            raise ValueError("Fraction must be between 0 and 1.")
+        if self.__count == 0:
+            return 0
+        wanted = fraction * self.__count
+        seen = 0
+        for bucket in range(LatencyHistogram.BUCKETS):
+            count = self.__counts[bucket]
+            seen += count
+            if count and seen >= wanted:
+                return min(1 << bucket, self.__max)
+        return self.__max
+
+    def as_dict(self) -> dict:
+        """
+        :complexity: O(B), B is the number of buckets.
+        """
+        return {
+            "count": self.__count,
+            "total_ns": self.__total,
+            "mean_ns": self.mean_ns,
+            "max_ns": self.__max,
+            "p50_ns": self.percentile(0.5),
+            "p99_ns": self.percentile(0.99),
+            # upper bound of each non-empty bucket -> number of durations in it
+            "buckets": {
+                1 << bucket: self.__counts[bucket]
+                for bucket in range(LatencyHistogram.BUCKETS)
+                if self.__counts[bucket]
+            },
+        }
+
+    def __str__(self) -> str:
+        return f"<LatencyHistogram {self.__count} samples, mean {self.mean_ns:.0f}ns, max {self.__max}ns>"
+
+    def __repr__(self) -> str:
+        return str(self)
+
+
+class LineStats:
+    """
+    What one iteration of a ProcessingLine did, filled in by InstrumentedProcessingLineIterator.
+    Times are from time.perf_counter_ns. All methods have O(1) complexity, except as_dict.
+    """
+
+    def __init__(self) -> None:
+        self.__stage_counts = _zeros(len(STAGES))
+        self.signing = LatencyHistogram()
+        self.next_call = LatencyHistogram()
+        self.__consumer_ns = 0
+        self.__before_high_water = 0
+        self.__after_high_water = 0
+        self.__started = None
+        self.__last = None
+
+    def record_item(self, stage: int) -> None:
+        """ Count a transaction returned from stage 0 (before), 1 (critical) or 2 (after). """
+        self.__stage_counts[stage] += 1
+
+    def record_next(self, entered: int, left: int) -> None:
+        """
+        Record a next() call that ran from entered to left. The time since the previous call
+        returned is counted as consumer time.
+        """
+        if self.__started is None:
+            self.__started = entered
+        elif self.__last is not None:
+            self.__consumer_ns += entered - self.__last
+        self.next_call.record(left - entered)
+        self.__last = left
+
+    def observe_before_depth(self, depth: int) -> None:
+        if depth > self.__before_high_water:
+            self.__before_high_water = depth
+
+    def observe_after_depth(self, depth: int) -> None:
+        if depth > self.__after_high_water:
+            self.__after_high_water = depth
+
+    def stage_count(self, stage: str) -> int:
+        """ :raises ValueError: if stage is not one of STAGES. """
+        return self.__stage_counts[STAGES.index(stage)]
+
+    @property
+    def items(self) -> int:
+        total = 0
+        for index in range(len(STAGES)):
+            total += self.__stage_counts[index]
+        return total
+
+    @property
+    def before_high_water(self) -> int:
+        return self.__before_high_water
+
+    @property
+    def after_high_water(self) -> int:
+        return self.__after_high_water
+
+    @property
+    def consumer_ns(self) -> int:
+        return self.__consumer_ns
+
+    @property
+    def elapsed_ns(self) -> int:
+        """ Time from the start of the first next() to the end of the latest one. """
+        if self.__started is None:
+            return 0
+        return self.__last - self.__started
+
+    @property
+    def items_per_second(self) -> float:
+        elapsed = self.elapsed_ns
+        return self.items * 1e9 / elapsed if elapsed > 0 else 0.0
+
+    def as_dict(self) -> dict:
+        """
+        :complexity: O(B), B is the number of histogram buckets.
+        """
+        return {
+            "stages": {STAGES[index]: self.__stage_counts[index] for index in range(len(STAGES))},
+            "items": self.items,
+            "items_per_second": self.items_per_second,
+            "elapsed_ns": self.elapsed_ns,
+            "consumer_ns": self.__consumer_ns,
+            "high_water": {"before": self.__before_high_water, "after": self.__after_high_water},
+            "signing": self.signing.as_dict(),
+            "next": self.next_call.as_dict(),
+        }
+
+    def __str__(self) -> str:
+        return f"<LineStats {self.items} items, {self.items_per_second:.0f} items/s>"
+
+    def __repr__(self) -> str:
+        return str(self)
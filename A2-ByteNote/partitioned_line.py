@@ -0,0 +1,86 @@
+"""
+Many processing lines, one per critical transaction, behind a single add/iterate interface.
+
+The critical transactions are kept sorted by timestamp. Partition i takes the transactions with
+    critical[i - 1].timestamp < timestamp <= critical[i].timestamp
+so they are processed before critical[i]; the last partition also takes every transaction after
+the last critical. A new transaction is routed with a binary search over the critical timestamps.
+Iterating goes through the partitions in timestamp order, each in its usual ProcessingLine order.
+"""
+from algorithms import insertion_sort
+from data_structures.referential_array import ArrayR
+
+from processing_line import ProcessingLine
+
+
+class PartitionedProcessingLine:
+
+    def __init__(self, critical_transactions, spill_segment_size=None) -> None:
+        """
+        :param critical_transactions: a non-empty ArrayR, list or other sequence of Transaction.
+        :param spill_segment_size: passed on to every ProcessingLine.
+        :raises ValueError: if there are no critical transactions.
+        :complexity:
+            Best: O(P) when the critical transactions are already in timestamp order.
+            Worst: O(P^2) for the insertion sort, P is the number of critical transactions.
+        """
+        criticals = ArrayR.from_list(critical_transactions)
+        if len(criticals) == 0:
+            raise ValueError("At least one critical transaction is needed.")
+        insertion_sort(criticals, key=lambda transaction: transaction.timestamp)
+
+        self.__timestamps = ArrayR(len(criticals))
+        self.__lines = ArrayR(len(criticals))
+        for index in range(len(criticals)):
+            self.__timestamps[index] = criticals[index].timestamp
+            self.__lines[index] = ProcessingLine(criticals[index], spill_segment_size=spill_segment_size)
+
+    def partition_of(self, timestamp) -> int:
+        """
+        Index of the partition a transaction with this timestamp belongs to:
+        the first critical with a timestamp >= it, or the last partition if there is none.
+        :complexity:
+            Best & Worst: O(log P), P is the number of partitions.
+        """
+        low = 0
+        high = len(self.__timestamps)
+        while low < high:
+            middle = (low + high) // 2
+            if self.__timestamps[middle] < timestamp:
+                low = middle + 1
+            else:
+                high = middle
+        return min(low, len(self.__timestamps) - 1)
+
+    def add_transaction(self, transaction) -> None:
+        """
+        :raises RuntimeError: if iteration has started.
+        :complexity:
+            Best & Worst: O(log P) to route, then O(1) to add (see ProcessingLine.add_transaction).
+        """
+        self.__lines[self.partition_of(transaction.timestamp)].add_transaction(transaction)
+
+    def line(self, index: int) -> ProcessingLine:
+        """ The ProcessingLine of partition index. """
+        return self.__lines[index]
+
+    def __iter__(self):
+        """
+        Yield the transactions of every partition, partitions in critical timestamp order.
+        Like ProcessingLine, only one iteration is allowed.
+        :raises RuntimeError: if iteration was already started.
+        :complexity: O(1) per transaction, O(N + P) overall.
+        """
+        iterators = ArrayR(len(self.__lines))
+        for index in range(len(self.__lines)):
+            iterators[index] = iter(self.__lines[index])
+        return self.__chain(iterators)
+
+    @staticmethod
+    def __chain(iterators):
+        for iterator in iterators:
+            yield from iterator
+
+    def __len__(self) -> int:
+        """ Number of partitions. """
+        return len(self.__lines)
@@ -2,11 +2,59 @@ from data_structures import ArrayR
 
 from processing_line import Transaction
 
-from data_structures.linked_stack import LinkedStack
+
+LEGAL_CHARACTERS = "abcdefghijklmnopqrstuvwxyz0123456789"
+# Page of each ASCII character, indexed by its code point; -1 for characters without a page
+_PAGE_BY_ORD = tuple(LEGAL_CHARACTERS.find(chr(code)) for code in range(128))
+
+
+def _page_of(character):
+    """
+    Return the page index of a signature character with one indexed read.
+    :raises ValueError: if the character is not one of LEGAL_CHARACTERS.
+    :complexity:
+        Best & Worst: O(1)
+    """
+    code = ord(character)
+    if code < 128:
+        page = _PAGE_BY_ORD[code]
+        if page >= 0:
+            return page
+    raise ValueError(f"{character!r} is not a legal signature character")
+
+
+def _signature_key(signature):
+    """
+    The signature as one int, 32 bits per character, so that two signatures of the same
+    length can be compared all at once (see _shared_prefix).
+    :complexity:
+        Best & Worst: O(L), L is the length of the signature, done in C.
+    """
+    return int.from_bytes(signature.encode("utf-32-be"), "big")
+
+
+def _shared_prefix(first, first_key, second, second_key):
+    """
+    Return how many leading characters two different signatures have in common.
+    For signatures of the same length, the highest bit where their keys differ gives it directly.
+    :complexity:
+        Best & Worst: O(L), L is the length of the signatures.
+    """
+    if len(first) == len(second):
+        return len(first) - 1 - ((first_key ^ second_key).bit_length() - 1) // 32
+    shared = 0
+    limit = min(len(first), len(second))
+    while shared < limit and first[shared] == second[shared]:
+        shared += 1
+    return shared
 
 
 class ProcessingBook:
-    LEGAL_CHARACTERS = "abcdefghijklmnopqrstuvwxyz0123456789"
+    LEGAL_CHARACTERS = LEGAL_CHARACTERS
+
+    # No per-book __dict__; total_transactions and total_errors are only set on the root book
+    __slots__ = ("pages", "current_level", "_root", "local_transactions",
+                 "total_transactions", "total_errors")
 
     def __init__(self, current_level=0, root_book=None):
         """
@@ -31,122 +79,232 @@ class ProcessingBook:
     def page_index(self, character):
         """
         You may find this method helpful. It takes a character and returns the index of the relevant page.
-        Time complexity of this method is O(1), because it always only checks 36 characters.
+        Looked up in a table indexed by the character's code point, rather than searching LEGAL_CHARACTERS.
+        :raises ValueError: if the character is not one of LEGAL_CHARACTERS.
         :complexity:
-            Best: O(1), alphabet is constant size 36 so lookup is bounded.
-            Worst: O(1), scanning fixed-size LEGAL_CHARACTERS string.
-        
+            Best: O(1), one indexed read.
+            Worst: O(1), same read for every character.
         """
-        return ProcessingBook.LEGAL_CHARACTERS.index(character)
+        return _page_of(character)
 
     
     def __setitem__(self, one_transaction: Transaction, one_amount: int):
         """
+        Store one_amount for one_transaction. Storing a different amount for a transaction
+        already in the book leaves it unchanged and counts an error.
         :complexity:
             Best: O(L), when the page is empty and we insert directly, only check one character.
-            Worst: O(L), when there are long collisions and we must recurse/promote down to the last character.
+            Worst: O(L), when there are long collisions and we must promote down to the last character.
             L is the length of the transaction signature.
         """
-        signature = one_transaction.signature
-        index = self.page_index(signature[self.current_level])
-        current_page = self.pages[index]
-
-        if current_page is None:
-            # page empty → just store the transaction and amount
-            self.pages[index] = (one_transaction, one_amount)
-            self._root.total_transactions += 1
-            self.local_transactions += 1   
-            return
-
-        if isinstance(current_page, ProcessingBook):
-            # already a child book → go deeper
-            current_page[one_transaction] = one_amount
-            self.local_transactions += 1
-            return
-
-        # otherwise the page has a leaf (old_transaction, old_amount)
-        old_transaction, old_amount = current_page
-
-        if old_transaction.signature == signature:
-            # same transaction
-            if old_amount != one_amount:
-                self._root.total_errors += 1  # illegal update
-            # if amounts are same → do nothing
-            return
-        else:
-            # collision with different transaction
-            # make a new child book one level deeper
-            new_child_book = ProcessingBook(
-                current_level=self.current_level + 1,
-                root_book=self._root
-            )
-            # move old one into child (without counting again)
-            new_child_book._move_leaf_without_count(old_transaction, old_amount)
-            # put the child book into this page
-            self.pages[index] = new_child_book
-            # insert the new transaction into the child (normal counting)
-            new_child_book[one_transaction] = one_amount
-            self.local_transactions += 1
+        self._store(one_transaction, one_amount, True)
 
     def __getitem__(self, one_transaction: Transaction) -> int:
         """
+        Walks down the nested books in a loop, one per character of the signature.
         :complexity:
             Best: O(L), when the transaction is found directly at its page.
-            Worst: O(L), when we must follow recursive books all the way to the last character.
+            Worst: O(L), when we must follow nested books all the way to the last character.
             L is the length of the transaction signature.
         """
         signature = one_transaction.signature
-        index = self.page_index(signature[self.current_level])
-        current_page = self.pages[index]
-
-        if current_page is None:
-            raise KeyError("Transaction not found")
-
-        if isinstance(current_page, ProcessingBook):
-            return current_page[one_transaction]
-
-        old_transaction, old_amount = current_page
-        if old_transaction.signature == signature:
-            return old_amount
-        else:
+        level = self.current_level
+        pages = self.pages.array
+        while True:
+            current_page = pages[_page_of(signature[level])]
+            if current_page is None:
+                raise KeyError("Transaction not found")
+            if isinstance(current_page, ProcessingBook):
+                pages = current_page.pages.array
+                level += 1
+                continue
+            old_transaction, old_amount = current_page
+            if old_transaction.signature == signature:
+                return old_amount
             raise KeyError("Transaction not found")
 
     def _move_leaf_without_count(self, one_transaction: Transaction, one_amount: int):
         """ 
+        Store a leaf below this book without changing the root's counters.
         :complexity:
             Best: O(L), when the correct page is empty at this level, we place the item immediately.
             Worst: O(L), when collisions continue for many levels until the signatures diverge.
             L is the length of the transaction signature.
         """
+        self._store(one_transaction, one_amount, False)
+
+    def _store(self, one_transaction: Transaction, one_amount: int, counted: bool):
+        """
+        Walk down from this book in a loop and store the leaf, for __setitem__ (counted) and
+        _move_leaf_without_count. Each book passed counts the new transaction on the way down,
+        as it will end up below it. In the rare case that the transaction is already stored,
+        the walk is retraced to take those counts back, instead of recording every book on the way.
+        A collision with another leaf first finds where the two signatures part, then creates the
+        books they share, each holding both of them, and reuses the old leaf as it is.
+        A signature that cannot be stored (an illegal character, or too short to part from the leaf
+        it collides with) raises before any book is created, and the counts made on the way down
+        are taken back, so the book is left as it was.
+        :raises ValueError: if the signature has a character that is not one of LEGAL_CHARACTERS.
+        :raises IndexError: if the signature ends before it can be told apart from another.
+        :complexity:
+            Best: O(L), when the page is empty at this level.
+            Worst: O(L), when collisions continue down to the last character.
+            L is the length of the transaction signature.
+        """
+        root = self._root
         signature = one_transaction.signature
-        index = self.page_index(signature[self.current_level])
-        current_page = self.pages[index]
-
-        if current_page is None:
-            self.pages[index] = (one_transaction, one_amount)
-            self.local_transactions += 1
-            return
-
-        if isinstance(current_page, ProcessingBook):
-            current_page._move_leaf_without_count(one_transaction, one_amount)
-            self.local_transactions += 1
-            return
-
-        # still a collision deeper
-        old_transaction, old_amount = current_page
-        if old_transaction.signature == signature:
-            return  # same one → ignore
-
-        # promote again
-        new_child_book = ProcessingBook(
-            current_level=self.current_level + 1,
-            root_book=self._root
-        )
-        new_child_book._move_leaf_without_count(old_transaction, old_amount)
-        self.pages[index] = new_child_book
-        new_child_book._move_leaf_without_count(one_transaction, one_amount)
-        self.local_transactions += 1
-    
+        level = self.current_level
+        book = self
+        try:
+            while True:
+                pages = book.pages.array
+                index = _page_of(signature[level])
+                current_page = pages[index]
+                if current_page is None:
+                    pages[index] = (one_transaction, one_amount)
+                    break
+                if isinstance(current_page, ProcessingBook):
+                    book.local_transactions += 1
+                    book = current_page
+                    level += 1
+                    continue
+
+                old_transaction, old_amount = current_page
+                old_signature = old_transaction.signature
+                if old_signature == signature:
+                    # already stored: nothing below the books passed has changed
+                    if counted and old_amount != one_amount:
+                        root.total_errors += 1
+                    self._retrace(signature, book)
+                    return
+
+                # collision: find where the two signatures part before changing anything
+                split = level + 1
+                new_index = _page_of(signature[split])
+                old_index = _page_of(old_signature[split])
+                while new_index == old_index:
+                    split += 1
+                    new_index = _page_of(signature[split])
+                    old_index = _page_of(old_signature[split])
+                break
+        except (ValueError, IndexError):
+            self._retrace(signature, book)
+            raise
+
+        if current_page is not None:
+            # new books down to the split, each holding both leaves
+            while level < split:
+                new_child_book = ProcessingBook(current_level=level + 1, root_book=root)
+                new_child_book.local_transactions = 2
+                pages[index] = new_child_book
+                pages = new_child_book.pages.array
+                level += 1
+                index = _page_of(signature[level])
+            pages[old_index] = current_page
+            pages[new_index] = (one_transaction, one_amount)
+
+        book.local_transactions += 1
+        if counted:
+            root.total_transactions += 1
+
+    def _retrace(self, signature, last_book, change=-1):
+        """
+        Add change to local_transactions of every book from this one down to (not including)
+        last_book on the path of signature. Undoes the counting of a walk that found nothing to do.
+        :complexity:
+            Best & Worst: O(L), L is the length of the signature.
+        """
+        book = self
+        level = self.current_level
+        while book is not last_book:
+            book.local_transactions += change
+            book = book.pages.array[_page_of(signature[level])]
+            level += 1
+
+    @classmethod
+    def from_sorted(cls, pairs):
+        """
+        Build a book in one pass from (transaction, amount) pairs sorted by signature in page
+        order (the order a book iterates in), e.g. the dump of another book.
+        Gives the same book as storing the pairs one by one: same length, same error count for
+        a repeated signature with a different amount (the first amount is kept), same local_transactions.
+        Each leaf goes straight to its final level, which is the longest prefix it shares with
+        the signature before or after it, so no leaf is ever moved down into a new book.
+        A leaf is therefore placed once the signature after it is known.
+        The books on the path of the last leaf placed are kept by level; when the path moves on,
+        the books left behind add their local_transactions to their parent.
+        :raises ValueError: if the pairs are not sorted by signature.
+        :complexity:
+            Best & Worst: O(N * L), N pairs, L the length of a signature.
+        """
+        book = cls()
+        pairs = iter(pairs)
+        first = next(pairs, None)
+        if first is None:
+            return book
+
+        path = ArrayR(len(first[0].signature) + 1)
+        books = path.array
+        books[0] = book
+        depth = 0
+        # The leaf waiting to be placed, and how many characters it shares with the one before it
+        pending, pending_amount = first
+        pending_signature = pending.signature
+        pending_key = _signature_key(pending_signature)
+        pending_shared = 0
+        while pending is not None:
+            following = next(pairs, None)
+            if following is None:
+                shared = 0
+            else:
+                one_transaction, one_amount = following
+                signature = one_transaction.signature
+                if signature == pending_signature:
+                    if one_amount != pending_amount:
+                        book.total_errors += 1
+                    continue
+                key = _signature_key(signature)
+                shared = _shared_prefix(signature, key, pending_signature, pending_key)
+                if (shared < len(signature) and shared < len(pending_signature)
+                        and _page_of(signature[shared]) < _page_of(pending_signature[shared])):
+                    raise ValueError("Transactions are not sorted by signature.")
+
+            # close the books not shared with the previous leaf, open those down to this one's level
+            level = shared if shared > pending_shared else pending_shared
+            while depth > pending_shared:
+                books[depth - 1].local_transactions += books[depth].local_transactions
+                books[depth] = None
+                depth -= 1
+            if level >= len(books):
+                longer = ArrayR(level + 1)
+                for index in range(depth + 1):
+                    longer[index] = books[index]
+                path = longer
+                books = path.array
+            parent = books[depth]
+            while depth < level:
+                child_book = ProcessingBook(current_level=depth + 1, root_book=book)
+                parent.pages.array[_page_of(pending_signature[depth])] = child_book
+                depth += 1
+                books[depth] = child_book
+                parent = child_book
+            parent.pages.array[_page_of(pending_signature[level])] = (pending, pending_amount)
+            parent.local_transactions += 1
+            book.total_transactions += 1
+
+            if following is None:
+                break
+            pending, pending_amount = one_transaction, one_amount
+            pending_signature = signature
+            pending_key = key
+            pending_shared = shared
+
+        while depth > 0:
+            books[depth - 1].local_transactions += books[depth].local_transactions
+            books[depth] = None
+            depth -= 1
+        return book
+
     def get_error_count(self):
         """
         Returns the number of errors encountered while storing transactions.
@@ -170,128 +328,225 @@ class ProcessingBook:
     def __delitem__(self, one_transaction: Transaction):    
         """
         Delete a transaction. Collapse child book if only 1 left.
+        Walks down in a loop, taking the transaction off the count of each book passed.
+        The highest book left holding one transaction is replaced by that leaf in its parent,
+        which is what collapsing each child book on the way back up would end with.
+        If the transaction is not there, or its signature cannot be in the book, the walk is
+        retraced to restore the counts.
+        :raises KeyError: if the transaction is not in the book.
+        :raises ValueError: if the signature has a character that is not one of LEGAL_CHARACTERS.
+        :raises IndexError: if the signature ends before a leaf is reached.
         :complexity:
             Best: O(L), when the transaction is found and removed directly.
-            Worst: O(L), when we recurse deep and also collapse.
+            Worst: O(L), when we go deep and also collapse.
             L is the length of the transaction signature.
         """
         signature = one_transaction.signature
-        index = self.page_index(signature[self.current_level])
-        current_page = self.pages[index]
-
-        if current_page is None:
-            raise KeyError("Transaction not found")
-
-        if isinstance(current_page, ProcessingBook):
-            # recurse into child
-            del current_page[one_transaction]
-            self.local_transactions -= 1
-
-            # collapse if child has only one item left
-            if current_page.local_transactions == 1:
-                only_leaf = current_page._get_only_leaf()
-                self.pages[index] = only_leaf
-            return
-
-        # page has a leaf
-        old_transaction, old_amount = current_page
-        if old_transaction.signature == signature:
-            self.pages[index] = None
-            self._root.total_transactions -= 1
-            self.local_transactions -= 1
-            return
-        else:
-            raise KeyError("Transaction not found")
+        level = self.current_level
+        book = self
+        # page of the highest book that will be left with one transaction, if any
+        collapse_pages = None
+        collapse_index = 0
+        try:
+            while True:
+                pages = book.pages.array
+                index = _page_of(signature[level])
+                current_page = pages[index]
+                if current_page is None:
+                    raise KeyError("Transaction not found")
+                if isinstance(current_page, ProcessingBook):
+                    book.local_transactions -= 1
+                    if collapse_pages is None and current_page.local_transactions == 2:
+                        collapse_pages = pages
+                        collapse_index = index
+                    book = current_page
+                    level += 1
+                    continue
+                old_transaction, old_amount = current_page
+                if old_transaction.signature != signature:
+                    raise KeyError("Transaction not found")
+                break
+        except (KeyError, ValueError, IndexError):
+            self._retrace(signature, book, 1)
+            raise
+
+        pages[index] = None
+        book.local_transactions -= 1
+        self._root.total_transactions -= 1
+        if collapse_pages is not None:
+            collapse_pages[collapse_index] = collapse_pages[collapse_index]._get_only_leaf()
 
-
-    
     def _get_only_leaf(self):
         """
-        Find the one remaining leaf in this book (used for collapse).
+        Find the one remaining leaf in this book (used for collapse), going down in a loop.
         :complexity:
             Best: O(1), must check each page but constant bound 36.
-            Worst: O(1), still constant, since alphabet is fixed 36.
+            Worst: O(L), 36 pages per level for each of the nested books it goes through.
         """
-        for i in range(len(ProcessingBook.LEGAL_CHARACTERS)):
-            slot = self.pages[i]
-            if slot is None:
-                continue
-            if isinstance(slot, ProcessingBook):
-                return slot._get_only_leaf()
+        book = self
+        while True:
+            pages = book.pages.array
+            for i in range(len(ProcessingBook.LEGAL_CHARACTERS)):
+                slot = pages[i]
+                if slot is not None:
+                    break
             else:
+                return None
+            if not isinstance(slot, ProcessingBook):
                 return slot
-        return None
+            book = slot
 
 
     # task 2.3
     def __iter__(self):
         """ 
+        Iterate over the (transaction, amount) leaves in page order.
+        Each call returns a new ProcessingBookIterator, so any number of iterations, over this
+        book or its nested books, can run at the same time, from several threads too, as long
+        as nothing is stored or deleted meanwhile.
         :complexity
-        Best: O(1) if first leaf is near the start.
-        Worst: O(L) if it has to descend down several nested books to reach the first leaf.
-        Overall: O(L) worst-case setup.
-        """
-        self._stack = LinkedStack()
-        self._stack.push((self,0))   # tuple = (book, index)
-        self._next_item = None
-        self._advance()   # move to first leaf
-        return self
+        Best & Worst: O(1), the iterator only finds the first leaf when next() is first called.
+        """
+        return ProcessingBookIterator(self, ProcessingBookIterator.ITEMS)
 
-    def __next__(self):
+    def keys(self):
+        """ A view of the transactions in the book, in page order. """
+        return ProcessingBookView(self, ProcessingBookIterator.KEYS)
+
+    def values(self):
+        """ A view of the amounts in the book, in the page order of their transactions. """
+        return ProcessingBookView(self, ProcessingBookIterator.VALUES)
+
+    def items(self):
+        """ A view of the (transaction, amount) leaves in the book, in page order. """
+        return ProcessingBookView(self, ProcessingBookIterator.ITEMS)
+
+    def sample(self, required_size):
         """
-        :complexity
-        Returning the result is O(1)
+        1054 Only - 1008/2085 welcome to attempt if you're up for a challenge, but no marks are allocated.
+        Analyse your time complexity of this method.
         """
-        if self._next_item is None:
-            raise StopIteration
-        result = self._next_item
-        self._advance()
-        return result
+        pass
+
+
+class ProcessingBookIterator:
+    """
+    Depth-first walk over the leaves of a book, in page order.
+    The path down from the book is kept as two arrays indexed by depth: the pages of each
+    book on it and the next page to look at there. They are sized for full-length signatures and
+    only grow for longer ones, so a step allocates nothing. Items are the leaf tuples themselves.
+    """
+    ITEMS = 0
+    KEYS = 1
+    VALUES = 2
 
-    def _advance(self):
+    # Books on the path of a full 36-character signature, plus the top one
+    INITIAL_DEPTH = len(LEGAL_CHARACTERS) + 1
+
+    def __init__(self, book: ProcessingBook, kind: int = ITEMS):
         """
-        :complexity
-        Amortized per call: O(1).
-        Across all N items: O(N).
+        :param kind: ITEMS for (transaction, amount) leaves, KEYS for transactions, VALUES for amounts.
+        :complexity:
+            Best & Worst: O(D), D = INITIAL_DEPTH, to create the path arrays.
         """
-        LEGAL = ProcessingBook.LEGAL_CHARACTERS
-        L = len(LEGAL)
-        self._next_item = None
+        self._kind = kind
+        self._pages = ArrayR(ProcessingBookIterator.INITIAL_DEPTH)
+        self._indices = ArrayR(ProcessingBookIterator.INITIAL_DEPTH)
+        self._pages[0] = book.pages
+        self._indices[0] = 0
+        self._depth = 0
 
-        while len(self._stack) > 0:
-            book, i = self._stack.pop()
+    def __iter__(self):
+        """
+        :complexity:
+            Best & Worst: O(1)
+        """
+        return self
 
-            if i >= L:
+    def __next__(self):
+        """
+        :raises StopIteration: when every leaf has been returned.
+        :complexity:
+            Best: O(1) when the next page holds a leaf.
+            Worst: O(L * P) when whole books must be passed, L levels of P = 36 pages;
+            O(1) amortised over the iteration, O(N) across all N leaves.
+        """
+        page_arrays = self._pages.array
+        indices = self._indices.array
+        depth = self._depth
+        while depth >= 0:
+            index = indices[depth]
+            if index == len(LEGAL_CHARACTERS):
                 # done with this book
+                page_arrays[depth] = None
+                depth -= 1
                 continue
-
-            # push back with next index to try later
-            self._stack.push((book, i+1))
-
-            page = book.pages[i]
+            indices[depth] = index + 1
+            page = page_arrays[depth].array[index]
             if page is None:
                 continue
-
             if isinstance(page, ProcessingBook):
                 # go deeper
-                self._stack.push((page,0))
+                depth += 1
+                if depth == len(page_arrays):
+                    self._grow()
+                    page_arrays = self._pages.array
+                    indices = self._indices.array
+                page_arrays[depth] = page.pages
+                indices[depth] = 0
                 continue
 
             # found a leaf
-            self._next_item = page
-            return
+            self._depth = depth
+            if self._kind == ProcessingBookIterator.ITEMS:
+                return page
+            return page[self._kind - 1]
 
-        # nothing left
-        self._next_item = None
+        self._depth = -1
+        raise StopIteration
+
+    def _grow(self):
+        """
+        Double the path arrays, for signatures longer than INITIAL_DEPTH - 1.
+        :complexity:
+            Best & Worst: O(D), D the current depth of the arrays.
+        """
+        page_arrays = ArrayR(2 * len(self._pages))
+        indices = ArrayR(2 * len(self._indices))
+        for depth in range(len(self._pages)):
+            page_arrays[depth] = self._pages[depth]
+            indices[depth] = self._indices[depth]
+        self._pages = page_arrays
+        self._indices = indices
 
 
+class ProcessingBookView:
+    """
+    keys(), values() or items() of a book. Each iteration over it walks the book afresh,
+    so it always reflects what the book holds.
+    """
 
-    def sample(self, required_size):
+    def __init__(self, book: ProcessingBook, kind: int):
         """
-        1054 Only - 1008/2085 welcome to attempt if you're up for a challenge, but no marks are allocated.
-        Analyse your time complexity of this method.
+        :complexity:
+            Best & Worst: O(1)
         """
-        pass
+        self._book = book
+        self._kind = kind
+
+    def __iter__(self):
+        """
+        :complexity:
+            Best & Worst: O(1), see ProcessingBookIterator.
+        """
+        return ProcessingBookIterator(self._book, self._kind)
+
+    def __len__(self) -> int:
+        """
+        :complexity:
+            Best & Worst: O(1)
+        """
+        return self._book.local_transactions
 
 
 if __name__ == "__main__":
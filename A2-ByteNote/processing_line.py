@@ -1,78 +1,377 @@
+import os
+import threading
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter_ns
+
+from data_structures.referential_array import ArrayR
+
+from data_structures.chunked_queue import ChunkedQueue
+from data_structures.chunked_stack import ChunkedStack
 from data_structures.linked_queue import LinkedQueue
 from data_structures.linked_stack import LinkedStack
 
+import signature_codec
+from line_stats import LineStats
+
+
+SIGNATURE_BASE = 31
+SIGNATURE_TABLE_SIZE = 36**36
+# The hash of any text shorter than this is below SIGNATURE_TABLE_SIZE, whatever its characters
+SHORT_TEXT = 35
+# Returned by ProcessingLineIterator.poll when an open streaming line has nothing ready yet
+NOT_READY = object()
+
+
+def _polynomial_hash(text):
+    """
+    Return the polynomial hash of text mod SIGNATURE_TABLE_SIZE, the value Transaction.sign
+    used to build one character at a time.
+    Text shorter than SHORT_TEXT never reaches SIGNATURE_TABLE_SIZE, so it is hashed without
+    taking a remainder per character; longer text is reduced as it goes, to keep the numbers small.
+    :complexity:
+        Best & Worst: O(n), n = len(text).
+    """
+    value = 0
+    if len(text) < SHORT_TEXT:
+        for char in text:
+            value = value * SIGNATURE_BASE + ord(char)
+        return value
+    for char in text:
+        value = (value * SIGNATURE_BASE + ord(char)) % SIGNATURE_TABLE_SIZE
+    return value
+
+
+def _signature_value(timestamp, from_user, to_user):
+    """
+    Compute the hash value a transaction's signature encodes: the polynomial hash of
+    "timestamp|from_user|to_user", as Transaction.sign always computed it.
+    :complexity:
+        Best & Worst: O(d + n), d = digits(timestamp) and n = len(from_user) + len(to_user) + 2.
+    """
+    return _polynomial_hash(str(timestamp) + "|" + from_user + "|" + to_user)
+
+
+def _compute_signature(timestamp, from_user, to_user):
+    """
+    Compute the signature of a transaction from its fields.
+    Kept at module level so worker processes can call it without pickling a Transaction.
+    :complexity:
+        Same as _signature_value, the base-36 encoding is O(1) (see signature_codec.encode).
+    """
+    return signature_codec.encode(_signature_value(timestamp, from_user, to_user))
+
+
+def _sign_chunk(chunk):
+    """
+    Worker entry point for Transaction.sign_many.
+    Takes a tuple of (timestamp, from_user, to_user) and returns their signatures in the same order.
+    :complexity:
+        Best & Worst: O(C * n), C is the chunk length and n the cost of one signature.
+    """
+    return tuple(_compute_signature(timestamp, from_user, to_user) for timestamp, from_user, to_user in chunk)
+
+
+def _as_array(items):
+    """
+    Return the items of an iterable in an ArrayR, in order. An ArrayR is returned as it is,
+    a sized iterable is copied straight into an ArrayR of its length, and anything else is
+    collected in a LinkedQueue first.
+    :complexity:
+        Best & Worst: O(N), N is the number of items, O(1) for an ArrayR.
+    """
+    if type(items) is ArrayR:
+        return items
+    if not hasattr(items, "__len__"):
+        queue = LinkedQueue()
+        for item in items:
+            queue.append(item)
+        result = ArrayR(len(queue))
+        for index in range(len(result)):
+            result[index] = queue.serve()
+        return result
+    result = ArrayR(len(items))
+    index = 0
+    for item in items:
+        result[index] = item
+        index += 1
+    return result
+
+
 class Transaction:
+    __slots__ = ("_timestamp", "_from_user", "_to_user", "_registry", "_from_id", "_to_id", "_signature")
+
+    # Transactions handed to each worker process at once by sign_many
+    SIGN_CHUNK_SIZE = 4096
+
+    def __init__(self, timestamp, from_user, to_user, registry=None):
+        """
+        :param registry: a UserRegistry to intern the names in, e.g. the one of the ingestion
+            run or batch this transaction belongs to. Without one the names are kept as given
+            and the user ids are -1.
+        :raises RuntimeError: if the registry is full and a name is new to it.
+        """
+        self._timestamp = timestamp
+        self._registry = registry
+        if registry is None:
+            self._from_user = from_user
+            self._to_user = to_user
+            self._from_id = self._to_id = -1
+        else:
+            # Interned, so every transaction of the same user shares one string object;
+            # the ids are kept so reading them later does not go back to the registry
+            self._from_id, self._from_user, self._to_id, self._to_user = registry.intern_pair(from_user, to_user)
+        self._signature = None
+
+    @property
+    def timestamp(self):
+        return self._timestamp
+
+    @timestamp.setter
+    def timestamp(self, value):
+        """ Changing a signed field drops the cached signature. """
+        self._timestamp = value
+        self._signature = None
+
+    @property
+    def from_user(self):
+        return self._from_user
+
+    @from_user.setter
+    def from_user(self, value):
+        """ Changing a signed field drops the cached signature. """
+        if self._registry is not None:
+            self._from_id = self._registry.intern(value)
+            value = self._registry.name(self._from_id)
+        self._from_user = value
+        self._signature = None
+
+    @property
+    def to_user(self):
+        return self._to_user
+
+    @to_user.setter
+    def to_user(self, value):
+        """ Changing a signed field drops the cached signature. """
+        if self._registry is not None:
+            self._to_id = self._registry.intern(value)
+            value = self._registry.name(self._to_id)
+        self._to_user = value
+        self._signature = None
+
+    @property
+    def signature(self):
+        """
+        The signature of this transaction, computed on first access and cached
+        until timestamp, from_user or to_user change.
+        :complexity:
+            Best: O(1) when it is cached.
+            Worst: O(n) when it must be computed, see _compute_signature.
+        """
+        if self._signature is None:
+            self._signature = _compute_signature(self._timestamp, self._from_user, self._to_user)
+        return self._signature
+
+    @signature.setter
+    def signature(self, value):
+        """ Store a signature explicitly, e.g. one computed elsewhere. None clears the cache. """
+        self._signature = value
+
+    @property
+    def is_signed(self):
+        """ True if the signature is already computed (or was set), without computing it. """
+        return self._signature is not None
 
-    def __init__(self, timestamp, from_user, to_user):
-        self.timestamp = timestamp
-        self.from_user = from_user
-        self.to_user = to_user
-        self.signature = None  
-    
     def sign(self):
         """
+        Compute the signature now, even if one is cached.
         :complexity:
-        Let n = len(from_user) + len(to_user) + digits(timestamp) + 2.
-        - Hash accumulation loop: O(n), one modular multiply/add per character.
-        - Base-36 conversion loop: at most 36 iterations (since value < 36^36) → O(1).
-        - Padding to fixed length: O(1).
-        Overall: O(n) time.
+        O(n) time, see _compute_signature.
         """
-        value = 0
-        base = 31
-        TABLE_SIZE = 36**36
+        self._signature = _compute_signature(self._timestamp, self._from_user, self._to_user)
 
-        ALPH = "0123456789abcdefghijklmnopqrstuvwxyz"
+    @property
+    def registry(self):
+        """ The UserRegistry the user ids refer to, or None if the names were not interned. """
+        return self._registry
 
-        data = str(self.timestamp) + "|" + self.from_user + "|" + self.to_user
+    @property
+    def from_user_id(self):
+        """
+        Id of the sender in the transaction's registry, so the users of transactions sharing
+        a registry can be compared as ints. -1 without a registry; compare from_user then.
+        :complexity:
+            Best & Worst: O(1), it is stored when the sender is set.
+        """
+        return self._from_id
 
-        for char in data:
-            value = (value * base + ord(char)) % TABLE_SIZE
+    @property
+    def to_user_id(self):
+        """
+        Id of the receiver in the transaction's registry, so the users of transactions sharing
+        a registry can be compared as ints. -1 without a registry; compare to_user then.
+        :complexity:
+            Best & Worst: O(1), it is stored when the receiver is set.
+        """
+        return self._to_id
+
+    @property
+    def binary_signature(self):
+        """
+        The signature in its 24 byte form (see signature_codec).
+        :complexity:
+            Best & Worst: O(L), L is the length of the signature, plus signing if it is not cached.
+        """
+        return signature_codec.to_binary(self.signature)
 
-        sig_str = ""
+    @classmethod
+    def sign_many(cls, transactions, workers=None, chunk_size=None, executor=None):
+        """
+        Sign many transactions at once, spreading the work over a pool of processes.
+        The transactions are cut into chunks, each chunk is signed by a worker, and the
+        signatures are written back in input order. Signatures are identical to sign().
+        Small inputs (or workers <= 1 without an executor) are signed in this process to skip
+        the pool start-up.
+        :param transactions: any iterable of Transaction, gathered into an ArrayR first.
+        :param workers: number of processes, defaults to the CPU count.
+        :param chunk_size: transactions per task, defaults to SIGN_CHUNK_SIZE.
+        :param executor: an executor to run the chunks on, which is left running. Without one,
+            a pool is started for this call and shut down before returning.
+        :complexity:
+            Best & Worst: O(N * n) total work, roughly O(N * n / W) wall time.
+            N is the number of transactions, n the cost of one signature, W the number of workers.
+        """
+        if chunk_size is None:
+            chunk_size = cls.SIGN_CHUNK_SIZE
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be positive.")
+        if workers is None:
+            workers = os.cpu_count() or 1
 
-        while value > 0:
-            value, rem = divmod(value, 36)
-            sig_str = ALPH[rem] + sig_str
+        pending = _as_array(transactions)
+        if len(pending) <= chunk_size or (executor is None and workers <= 1):
+            for transaction in pending:
+                transaction.sign()
+            return
 
-        if sig_str == "":
-            sig_str = "0"
-        
-        if len(sig_str) < 36:
-            sig_str = ("0" * (36 - len(sig_str))) + sig_str
-        
-        self.signature = sig_str
-                
-                
+        if executor is not None:
+            cls._sign_on(executor, pending, chunk_size)
+            return
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            cls._sign_on(pool, pending, chunk_size)
 
+    @classmethod
+    def _sign_on(cls, executor, transactions, chunk_size):
+        """
+        Sign the transactions chunk by chunk on the executor and write the signatures back.
+        :complexity:
+            Best & Worst: O(N * n) total work, N the number of transactions, n the cost of one signature.
+        """
+        position = 0
+        for signatures in executor.map(_sign_chunk, cls._fields_in_chunks(transactions, chunk_size)):
+            for signature in signatures:
+                transactions[position].signature = signature
+                position += 1
 
+    @staticmethod
+    def _fields_in_chunks(transactions, chunk_size):
+        """
+        Yield the signing fields of an ArrayR of transactions, chunk_size transactions at a time.
+        Only plain tuples are sent to the workers, which keeps pickling cheap (an ArrayR cannot
+        be pickled at all).
+        :complexity:
+            Best & Worst: O(N) across all chunks.
+        """
+        for start in range(0, len(transactions), chunk_size):
+            yield tuple(
+                (transactions[index].timestamp, transactions[index].from_user, transactions[index].to_user)
+                for index in range(start, min(start + chunk_size, len(transactions)))
+            )
 
 
 class ProcessingLine:
-    def __init__(self, critical_transaction):
+    def __init__(self, critical_transaction, streaming=False, spill_segment_size=None, instrument=False,
+                 chunked=False):
         """
+        :param streaming: if True, iteration may start while transactions are still being added.
+            The iterator then serves the before-critical FIFO as it fills, and only moves on to
+            the critical and after-critical transactions once close() is called. While the line
+            is open and nothing is ready, poll() returns NOT_READY and next() raises RuntimeError.
+        :param spill_segment_size: if given, at most this many after-critical transactions are
+            kept in memory; the rest are spilled to temporary files (see spill_stack).
+        :param instrument: if True, the iterator records what it does into self.stats
+            (see line_stats). Otherwise no recording code runs at all.
+        :param chunked: if True, keep the transactions in a ChunkedQueue and ChunkedStack, which
+            fill ArrayR segments instead of allocating a node per transaction. Otherwise the line
+            uses LinkedQueue and LinkedStack.
         :complexity:
-            Best & Worst: O(1) – just field initialisation.
+            Best & Worst: O(1) – just field initialisation, O(S) for the first segments if chunked.
         """
         self._critical_trans = critical_transaction
         # BEFORE (t <= critical): FIFO so we can output oldest -> newest before the critical
-        self._before_critical = LinkedQueue()
+        self._before_critical = ChunkedQueue() if chunked else LinkedQueue()
         # AFTER (t > critical):  LIFO so we can output newest -> oldest after the critical
-        self._after_critical = LinkedStack()
+        if spill_segment_size is None:
+            self._after_critical = ChunkedStack() if chunked else LinkedStack()
+        else:
+            # imported here as spill_stack itself depends on Transaction
+            from spill_stack import SpillingTransactionStack
+            self._after_critical = SpillingTransactionStack(spill_segment_size)
         # Locking / single-iterator flags
         self._it_created = False
         self._line_fixed = False
+        self._streaming = streaming
+        self._stats = LineStats() if instrument else None
 
     def __iter__(self):
         """
         :complexity:
             Best & Worst: O(1) – set flags and return iterator.
         """
+        return self.iterator()
+
+    def iterator(self, prefetch=0, executor=None):
+        """
+        Create the (only) iterator of this line; iter(line) is iterator() with no prefetching.
+        :param prefetch: if > 0, sign up to this many upcoming transactions ahead of the
+            consumer on a pool of worker processes (see ProcessingLineIterator). Every chunk of
+            prefetch / 4 transactions costs a round trip to a worker, so small windows (tens of
+            transactions) lose more to hand-offs than they save; see benchmarks/bench_prefetch.
+        :param executor: a concurrent.futures executor to sign on instead of a new process pool.
+        :raises RuntimeError: if an iterator was already created.
+        :raises ValueError: if prefetching from a streaming line that is still open.
+        :complexity:
+            Best & Worst: O(1) – set flags and return iterator.
+        """
         if self._it_created:
             raise RuntimeError("Only one iterator can be created.")
+        if prefetch > 0 and self._streaming and not self._line_fixed:
+            raise ValueError("Cannot prefetch from a streaming line before it is closed.")
         self._it_created = True
+        if not self._streaming:
+            self._line_fixed = True
+        if self._stats is not None:
+            return InstrumentedProcessingLineIterator(self, prefetch, executor)
+        return ProcessingLineIterator(self, prefetch, executor)
+
+    def close(self):
+        """
+        Declare that no more transactions will be added.
+        Needed in streaming mode before the iterator can get past the before-critical transactions.
+        :complexity:
+            Best & Worst: O(1)
+        """
         self._line_fixed = True
-        return ProcessingLineIterator(self)
+
+    @property
+    def stats(self):
+        """ The LineStats of this line, or None if it was not created with instrument=True. """
+        return self._stats
+
+    @property
+    def is_closed(self):
+        """ True once no more transactions can be added. """
+        return self._line_fixed
 
     def add_transaction(self, transaction):
         """
@@ -80,24 +379,89 @@ class ProcessingLine:
             Best & Worst: O(1) – one append or one push.
         """
         if self._line_fixed:
-            raise RuntimeError("Iteration has started; no more transactions can be added.")
+            raise RuntimeError("Iteration has started or the line is closed; no more transactions can be added.")
         if transaction.timestamp <= self._critical_trans.timestamp:
             self._before_critical.append(transaction)  # enqueue to BEFORE (FIFO)
         else:
             self._after_critical.push(transaction)     # push to AFTER (LIFO)
 
+    def add_transactions(self, transactions):
+        """
+        Add every transaction of an iterable, checking the line state only once.
+        :raises RuntimeError: if iteration has started or the line is closed.
+        :complexity:
+            Best & Worst: O(N), N is the number of transactions.
+        """
+        if self._line_fixed:
+            raise RuntimeError("Iteration has started or the line is closed; no more transactions can be added.")
+        critical_timestamp = self._critical_trans.timestamp
+        append = self._before_critical.append
+        push = self._after_critical.push
+        for transaction in transactions:
+            if transaction.timestamp <= critical_timestamp:
+                append(transaction)
+            else:
+                push(transaction)
+
+
+class _PrefetchedChunk:
+    """
+    Transactions taken from the line together by the prefetch feeder, in output order.
+    signed is set once their signatures have been written back.
+    """
+    __slots__ = ("transactions", "count", "signed")
+
+    def __init__(self, transactions, count):
+        self.transactions = transactions
+        self.count = count
+        self.signed = False
+
 
 class ProcessingLineIterator:
-    def __init__(self, line: ProcessingLine):
+    # Prefetched transactions are sent to the workers in this many chunks
+    PREFETCH_CHUNKS = 4
+
+    def __init__(self, line: ProcessingLine, prefetch=0, executor=None):
         """
+        With prefetch > 0, a feeder thread takes up to `prefetch` upcoming transactions (in output
+        order) from the line, has them signed in chunks on worker processes, and writes the
+        signatures back, all while the consumer handles earlier ones. next() then only hands out
+        transactions of a chunk already signed, waiting if the feeder is behind.
+        The output order is unchanged and the same Transaction objects are returned.
         :complexity:
             Best & Worst: O(1) – store references and set stage.
         """
-        self._before_critical = line._before_critical   # LinkedQueue
-        self._after_critical  = line._after_critical    # LinkedStack
+        if prefetch < 0:
+            raise ValueError("prefetch cannot be negative.")
+        self._line = line
+        self._before_critical = line._before_critical   # LinkedQueue or ChunkedQueue
+        self._after_critical  = line._after_critical    # LinkedStack, ChunkedStack or SpillingTransactionStack
         self._critical_       = line._critical_trans
         self._stage = 0  # 0 = before, 1 = critical, 2 = after, 3 = done
 
+        # Prefetching: the feeder thread appends _PrefetchedChunk to _chunks, the consumer serves
+        # them once signed. Everything shared between the two is guarded by _condition.
+        self._prefetch = prefetch
+        self._chunk_size = max(1, prefetch // ProcessingLineIterator.PREFETCH_CHUNKS)
+        self._executor = executor
+        self._owns_executor = False
+        self._condition = threading.Condition()
+        self._chunks = LinkedQueue()
+        self._in_flight = 0
+        self._taken_all = False
+        self._fed_all = False
+        self._paused = 0
+        self._closing = False
+        self._error = None
+        self._feeder = None
+        # Set by the finaliser when this iterator is dropped without close(), see _watch_resources
+        self._abandoned = threading.Event()
+        self._finalizer = None
+        # The chunk the consumer is going through, only touched by the consumer
+        self._current = None
+        self._current_count = 0
+        self._current_position = 0
+
     def __iter__(self):
         """
         :complexity:
@@ -106,13 +470,130 @@ class ProcessingLineIterator:
         return self
 
     def __next__(self):
+        """
+        Return the next transaction, signed ahead of time when prefetching.
+        :raises StopIteration: when all transactions have been processed.
+        :raises RuntimeError: if an open streaming line has nothing ready, see _take_next.
+        :complexity:
+            Best & Worst: O(1) amortised, see _take_next and _next_prefetched.
+        """
+        if self._prefetch == 0:
+            return self._take_next()
+        return self._next_prefetched()
+
+    def poll(self):
+        """
+        Return the next transaction like next(), or NOT_READY if the line is a streaming line
+        that is still open and has nothing ready yet. Nothing is taken in that case, so polling
+        again after more transactions are added carries on where it stopped.
+        :raises StopIteration: when all transactions have been processed.
+        :complexity:
+            Best & Worst: O(1) plus next().
+        """
+        if self._waits_for_producers():
+            return NOT_READY
+        return next(self)
+
+    @property
+    def may_run_dry(self):
+        """
+        True if next() can find nothing ready before the line is finished, i.e. the line is a
+        streaming line that is still open.
+        """
+        return not self._line._line_fixed
+
+    def _waits_for_producers(self):
+        """
+        True if the line is open and the next transaction has not been added yet.
+        :complexity:
+            Best & Worst: O(1)
+        """
+        return self._stage == 0 and not self._line._line_fixed and self._before_critical.is_empty()
+
+    def next_batch(self, size):
+        """
+        Return an ArrayR of up to `size` next transactions, in order, all signed.
+        The ones not signed yet are signed together, on the iterator's executor for big batches.
+        An empty array means the line is finished (or, in streaming mode, has nothing ready yet).
+        :raises ValueError: if size is not positive.
+        :complexity:
+            Best & Worst: O(size * n), n the cost of one signature.
+        """
+        if size <= 0:
+            raise ValueError("Batch size must be positive.")
+        batch = ArrayR(size)
+        count = 0
+        try:
+            while count < size:
+                transaction = self.poll()
+                if transaction is NOT_READY:
+                    break
+                batch[count] = transaction
+                count += 1
+        except StopIteration:
+            pass
+        return self._finish_batch(batch, count)
+
+    def _finish_batch(self, batch, count):
+        """
+        Cut a batch down to its first count transactions and sign those not signed yet.
+        :complexity:
+            Best & Worst: O(B * n), B = len(batch), n the cost of one signature.
+        """
+        if count < len(batch):
+            shorter = ArrayR(count)
+            for index in range(count):
+                shorter[index] = batch[index]
+            batch = shorter
+        count = 0
+        for transaction in batch:
+            if not transaction.is_signed:
+                count += 1
+        unsigned = ArrayR(count)
+        count = 0
+        for transaction in batch:
+            if not transaction.is_signed:
+                unsigned[count] = transaction
+                count += 1
+        executor = self._batch_executor(len(unsigned))
+        if executor is None:
+            for transaction in unsigned:
+                transaction.sign()
+        else:
+            Transaction.sign_many(unsigned, executor=executor)
+        return batch
+
+    def _batch_executor(self, count):
+        """
+        The executor to sign count transactions of a batch on, or None to sign them here.
+        Batches of up to SIGN_CHUNK_SIZE, and all batches on a single CPU or after close(), are
+        signed here. Bigger ones go to the iterator's executor, which is started on first need and
+        kept (also for the prefetch feeder) until close(), so one pool serves every batch.
+        :complexity:
+            Best & Worst: O(1), plus starting the pool the first time.
+        """
+        if count <= Transaction.SIGN_CHUNK_SIZE or self._closing:
+            return None
+        if self._executor is None:
+            if (os.cpu_count() or 1) <= 1:
+                return None
+            self._executor = ProcessPoolExecutor()
+            self._owns_executor = True
+            self._watch_resources()
+        return self._executor
+
+    def _take_next(self):
         """
         Return the next transaction in the required order;
         The order is:
           1) oldest -> newest (FIFO) BEFORE the critical
           2) critical (once)
           3) newest -> oldest (LIFO) AFTER the critical
+        Once StopIteration is raised it is raised on every later call, as for any iterator.
+        Signatures are computed lazily by Transaction.signature, so they are never empty when read.
         :raises StopIteration: when all transactions have been processed.
+        :raises RuntimeError: if the line is a streaming line that is still open and its
+            next transaction has not been added yet (see poll); the stage is kept.
         :complexity:
             Best: O(1) – one queue serve / one stack pop / or the critical.
             Worst: O(1) per call; overall O(N) across the full traversal.
@@ -120,34 +601,409 @@ class ProcessingLineIterator:
 
         if self._stage == 0:
             if not self._before_critical.is_empty():
-                tx = self._before_critical.serve()
-                if tx.signature is None:
-                    tx.sign()
-                return tx
+                return self._before_critical.serve()
+            if not self._line._line_fixed:
+                # streaming: producers may still add before-critical transactions, so the line
+                # is not finished and StopIteration would end a for loop or zip too early
+                raise RuntimeError("The streaming line is open and has nothing ready; poll() or close() it.")
             self._stage = 1  
 
     
         if self._stage == 1:
             self._stage = 2
-            tx = self._critical_
-            if tx.signature is None:
-                tx.sign()
-            return tx
+            return self._critical_
 
 
         if self._stage == 2:
             if not self._after_critical.is_empty():
-                tx = self._after_critical.pop()
-                if tx.signature is None:
-                    tx.sign()
-                return tx
+                return self._after_critical.pop()
             self._stage = 3  
 
 
         raise StopIteration
 
+    def _next_prefetched(self):
+        """
+        Return the next transaction from the prefetched chunks.
+        :raises StopIteration: when the feeder has handed out every transaction of the line.
+        :complexity:
+            Best: O(1) when the current chunk still has transactions.
+            Worst: O(1) plus waiting for the feeder when a new chunk is needed.
+        """
+        position = self._current_position
+        if position == self._current_count:
+            self._next_chunk()
+            position = 0
+        transaction = self._current[position]
+        self._current[position] = None
+        self._current_position = position + 1
+        return transaction
+
+    def _next_chunk(self):
+        """
+        Make the oldest prefetched chunk the current one, starting the feeder on first use.
+        Once the feeder has stopped, by close() or an early end, chunks it left unsigned are
+        signed here, and then the rest of the line is taken here a chunk at a time, so the
+        transactions still come out in order and signed. The same goes while the feeder is
+        paused by an open remaining() generator and has nothing prefetched.
+        :raises StopIteration: when every transaction of the line was served.
+        :complexity:
+            Best & Worst: O(C * n) when the chunk is signed here, C the chunk size and n the
+            cost of one signature, otherwise O(1) plus waiting for the feeder.
+        """
+        condition = self._condition
+        with condition:
+            if self._feeder is None and not self._fed_all:
+                self._start_feeder()
+            while self._error is None:
+                if not self._chunks.is_empty():
+                    if self._chunks.peek().signed or self._fed_all:
+                        break
+                elif self._fed_all or self._paused:
+                    # a paused feeder takes nothing more, so the next chunk is taken here
+                    break
+                condition.wait()
+            error = self._error
+            entry = None
+            if error is None:
+                if self._chunks.is_empty() and not self._taken_all:
+                    self._take_chunk()
+                if not self._chunks.is_empty():
+                    entry = self._chunks.serve()
+                    self._in_flight -= entry.count
+                    condition.notify_all()
+        if entry is None:
+            self.close()
+            if error is not None:
+                raise error
+            raise StopIteration
+        if not entry.signed:
+            # the feeder is gone, or paused and this chunk was taken here,
+            # so nothing else writes to this chunk
+            self._sign_left(entry)
+        self._current = entry.transactions
+        self._current_count = entry.count
+        self._current_position = 0
+
+    def _sign_left(self, entry):
+        """
+        Sign the transactions of a chunk the feeder did not sign, in this thread.
+        :complexity:
+            Best & Worst: O(C * n), C the chunk size and n the cost of one signature.
+        """
+        chunk = entry.transactions
+        for index in range(entry.count):
+            if not chunk[index].is_signed:
+                chunk[index].sign()
+        entry.signed = True
+
+    def _start_feeder(self):
+        """
+        Start the feeder thread, and a process pool for it if no executor was given.
+        :complexity:
+            Best & Worst: O(1), plus starting the pool.
+        """
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor()
+            self._owns_executor = True
+        self._feeder = threading.Thread(
+            target=ProcessingLineIterator._feed,
+            args=(weakref.ref(self), self._condition, self._abandoned),
+            name="prefetch-feeder",
+            daemon=True,
+        )
+        self._feeder.start()
+        self._watch_resources()
+
+    def _watch_resources(self):
+        """
+        (Re)register the finaliser that stops the feeder and shuts down the pool this iterator
+        created, for when the iterator is dropped without close(). close() detaches it.
+        :complexity:
+            Best & Worst: O(1)
+        """
+        if self._finalizer is not None:
+            self._finalizer.detach()
+        executor = self._executor if self._owns_executor else None
+        self._finalizer = weakref.finalize(
+            self, _release_abandoned, self._condition, self._abandoned, self._feeder, executor
+        )
+        # at exit the daemon feeder just stops, and the pool shuts itself down
+        self._finalizer.atexit = False
+
+    @staticmethod
+    def _feed(reference, condition, abandoned):
+        """
+        Feeder thread: keep up to `prefetch` transactions taken from the line, submit each chunk
+        for signing as it is taken, and write the signatures back oldest chunk first.
+        Only taking from the line happens under the lock, so the consumer is never held up by
+        building, pickling or writing back a chunk.
+        The iterator is only held through a weak reference, and only while the lock is held, so an
+        iterator dropped without close() is still collected. Its finaliser sets `abandoned`.
+        :complexity: O(N) for the whole line, N transactions, plus the signing itself.
+        """
+        submitted = LinkedQueue()   # (chunk, future), oldest first
+        iterator = None
+        try:
+            while True:
+                with condition:
+                    iterator = reference()
+                    if iterator is None or iterator._closing:
+                        return
+                    entry = None
+                    if not iterator._taken_all and not iterator._paused and iterator._in_flight < iterator._prefetch:
+                        entry = iterator._take_chunk()
+                    if entry is None and submitted.is_empty():
+                        if iterator._taken_all:
+                            return
+                        # letting go can run the finaliser right here, which sets abandoned
+                        iterator = None
+                        if not abandoned.is_set():
+                            condition.wait()
+                        continue
+                    executor = iterator._executor
+                    iterator = None
+                if entry is not None:
+                    chunk = entry.transactions
+                    fields = tuple(
+                        (chunk[index].timestamp, chunk[index].from_user, chunk[index].to_user)
+                        for index in range(entry.count)
+                    )
+                    submitted.append((entry, executor.submit(_sign_chunk, fields)))
+                    continue
+
+                entry, future = submitted.serve()
+                signatures = future.result()
+                chunk = entry.transactions
+                for index in range(entry.count):
+                    if not chunk[index].is_signed:
+                        chunk[index].signature = signatures[index]
+                with condition:
+                    entry.signed = True
+                    condition.notify_all()
+        except BaseException as error:
+            with condition:
+                iterator = reference()
+                if iterator is not None:
+                    iterator._error = error
+        finally:
+            with condition:
+                iterator = reference()
+                if iterator is not None:
+                    iterator._fed_all = True
+                condition.notify_all()
+                iterator = None
+
+    def _take_chunk(self):
+        """
+        Take the next chunk of transactions from the line and queue it for the consumer.
+        Called by the feeder with the lock held.
+        :return: the new _PrefetchedChunk, or None if the line had nothing left.
+        :complexity:
+            Best & Worst: O(C), C is the chunk size.
+        """
+        chunk = ArrayR(self._chunk_size)
+        count = 0
+        try:
+            while count < self._chunk_size:
+                chunk[count] = self._take_next()
+                count += 1
+        except StopIteration:
+            self._taken_all = True
+        if count == 0:
+            return None
+        entry = _PrefetchedChunk(chunk, count)
+        self._chunks.append(entry)
+        self._in_flight += count
+        return entry
+
+    def remaining(self):
+        """
+        Yield the transactions this iterator has still to return, in order, without consuming them.
+        Prefetched transactions come first, then the rest of the current stage and the stages after it.
+        The feeder takes nothing from the line until the generator is finished or closed; next()
+        meanwhile serves what was prefetched and then takes and signs chunks itself.
+        :complexity: O(R) for the whole iteration, R is the number of transactions left.
+        """
+        condition = self._condition
+        with condition:
+            self._paused += 1
+        try:
+            if self._current is not None:
+                for index in range(self._current_position, self._current_count):
+                    yield self._current[index]
+            if not self._chunks.is_empty():
+                node = self._chunks.peek_node()
+                while node is not None:
+                    entry = node.item
+                    for index in range(entry.count):
+                        yield entry.transactions[index]
+                    node = node.link
+            if self._stage == 0:
+                yield from _items_of(self._before_critical)
+            if self._stage <= 1:
+                yield self._critical_
+            if self._stage <= 2:
+                yield from _items_of(self._after_critical)
+        finally:
+            with condition:
+                self._paused -= 1
+                condition.notify_all()
+
+    def checkpoint(self, path):
+        """
+        Save the transactions still to be returned to a file, so a new worker can carry on
+        with line_checkpoint.resume(path) instead of rebuilding the line.
+        This iterator is not affected and can keep going.
+        :raises RuntimeError: if the line is still open (in streaming mode).
+        :complexity: O(R), R transactions left.
+        """
+        if not self._line._line_fixed:
+            raise RuntimeError("Cannot checkpoint a line that is still open.")
+        # imported here as line_checkpoint itself depends on Transaction
+        from line_checkpoint import write_checkpoint
+        return write_checkpoint(path, self.remaining())
+
+    def close(self):
+        """
+        Stop the feeder and shut down the worker pool if this iterator created it.
+        Called automatically at the end, and by a finaliser if the iterator is dropped before
+        that (see _watch_resources). Iterating after close() carries on without prefetching:
+        the transactions already taken and the rest of the line are signed in next().
+        :complexity:
+            Best & Worst: O(1), plus waiting for signing already submitted.
+        """
+        feeder = self._feeder
+        with self._condition:
+            self._closing = True
+            if feeder is None:
+                # no feeder will be started any more, so none is left to feed
+                self._fed_all = True
+            self._condition.notify_all()
+        if feeder is not None:
+            if feeder is not threading.current_thread():
+                feeder.join()
+            self._feeder = None
+        if self._owns_executor:
+            self._executor.shutdown()
+            self._executor = None
+            self._owns_executor = False
+        if self._finalizer is not None:
+            self._finalizer.detach()
+            self._finalizer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _release_abandoned(condition, abandoned, feeder, executor):
+    """
+    Finaliser of a ProcessingLineIterator dropped without close(): wake its feeder, which then
+    stops, wait for it, and shut down the pool the iterator created (executor is None otherwise).
+    :complexity:
+        Best & Worst: O(1), plus waiting for signing already submitted.
+    """
+    with condition:
+        abandoned.set()
+        condition.notify_all()
+    if feeder is not None and feeder is not threading.current_thread():
+        feeder.join()
+    if executor is not None:
+        executor.shutdown()
+
+
+def _items_of(container):
+    """
+    Yield the items of a line's queue (front to rear) or stack (top to bottom) without taking
+    them out, so the iterator can keep serving from the container while this generator is open.
+    LinkedQueue is read through its nodes from peek_node(); a node served meanwhile still links
+    to the rest. LinkedStack has no way to read below its top, so it is copied into an ArrayR
+    snapshot first (popped and pushed back in one go, before anything is yielded). The chunked
+    ADTs reuse the slots they serve, so they are copied too. The spilling stack reads its own
+    segments and files.
+    :complexity: O(N) for the whole iteration, N items, plus O(N) memory for a snapshot.
+    """
+    if type(container) is LinkedQueue:
+        node = None if container.is_empty() else container.peek_node()
+        while node is not None:
+            yield node.item
+            node = node.link
+        return
+    if type(container) is LinkedStack:
+        snapshot = ArrayR(len(container))
+        for index in range(len(snapshot)):
+            snapshot[index] = container.pop()
+        for index in range(len(snapshot) - 1, -1, -1):
+            container.push(snapshot[index])
+    elif type(container) is ChunkedQueue or type(container) is ChunkedStack:
+        snapshot = ArrayR(len(container))
+        index = 0
+        for item in container:
+            snapshot[index] = item
+            index += 1
+    else:
+        yield from container
+        return
+    for index in range(len(snapshot)):
+        yield snapshot[index]
+
+
+class InstrumentedProcessingLineIterator(ProcessingLineIterator):
+    """
+    A ProcessingLineIterator that records stage counts, timings and queue depths into the
+    line's LineStats. Returns the same transactions in the same order.
+    Unsigned transactions are signed inside next() rather than on first access by the consumer,
+    so that signing time can be measured apart from the consumer's own time.
+    """
+
+    def __init__(self, line: ProcessingLine, prefetch=0, executor=None):
+        """
+        :complexity:
+            Best & Worst: O(1)
+        """
+        super().__init__(line, prefetch, executor)
+        self._stats = line._stats
+        self._stats.observe_before_depth(len(self._before_critical))
+
+    def __next__(self):
+        """
+        :complexity:
+            Best & Worst: as ProcessingLineIterator.__next__, plus O(1) to record.
+        """
+        entered = perf_counter_ns()
+        transaction = super().__next__()
+        self._stats.record_next(entered, perf_counter_ns())
+        return transaction
+
+    def _take_next(self):
+        """
+        ProcessingLineIterator._take_next, counting the stage each transaction comes from.
+        Depths only grow between serves, so sampling them before each serve finds the high-water marks.
+        :complexity:
+            Best & Worst: O(1), plus signing when not prefetching.
+        """
+        stats = self._stats
+        stage = self._stage
+        if stage == 0:
+            stats.observe_before_depth(len(self._before_critical))
+        elif stage == 2:
+            stats.observe_after_depth(len(self._after_critical))
+        transaction = super()._take_next()
+        if self._stage == 0:
+            stats.record_item(0)
+        elif stage < 2:
+            stats.record_item(1)
+        else:
+            stats.record_item(2)
+        if self._prefetch == 0 and not transaction.is_signed:
+            started = perf_counter_ns()
+            transaction.sign()
+            stats.signing.record(perf_counter_ns() - started)
+        return transaction
 
-        
 
 if __name__ == "__main__":
     # Write tests for your code here...
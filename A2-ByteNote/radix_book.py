@@ -0,0 +1,260 @@
+"""
+A path-compressed (radix) ProcessingBook.
+
+In ProcessingBook every character two signatures share gets a nested book of its own, so two
+signatures with a 30-character common prefix cost 30 books of 36 pages each, and every lookup
+walks through all of them. Here a node also stores the run of characters that every signature
+below it shares (its prefix) and only branches where signatures differ. Two colliding
+signatures cost one new node whatever the length of their common prefix, and a lookup visits
+one node per point where stored signatures actually diverge.
+
+A node keeps its pages in one flat ArrayR of 2 * 36 cells: cell p is the page (a transaction,
+a child _RadixNode or None) and cell 36 + p the amount of a transaction stored on page p.
+The book behaves as ProcessingBook for set, get, delete, error counting and iteration order.
+"""
+from data_structures.referential_array import ArrayR
+
+from book_path import INITIAL_DEPTH, doubled
+from processing_book import LEGAL_CHARACTERS, _page_of
+
+PAGES = len(LEGAL_CHARACTERS)
+
+
+class _RadixNode:
+    """
+    A node whose signatures all continue with prefix, then branch on the next character.
+    """
+    __slots__ = ("prefix", "cells")
+
+    def __init__(self, prefix: str) -> None:
+        """
+        :complexity: O(P), P = 36 pages.
+        """
+        self.prefix = prefix
+        self.cells = ArrayR(2 * PAGES)
+
+
+class RadixProcessingBook:
+    __slots__ = ("_top", "_length", "_errors")
+
+    def __init__(self) -> None:
+        # The top node never has a prefix, so it is never split or merged away
+        self._top = _RadixNode("")
+        self._length = 0
+        self._errors = 0
+
+    def __setitem__(self, transaction, amount) -> None:
+        """
+        Store amount for transaction. Storing a different amount for a transaction already
+        in the book leaves it unchanged and counts an error.
+        Every page is looked up before a node is changed, so a signature that cannot be stored
+        raises with the book left as it was.
+        :raises ValueError: if the signature has a character that is not one of LEGAL_CHARACTERS.
+        :raises IndexError: if the signature ends before it can be told apart from another.
+        :complexity:
+            Best & Worst: O(L), L is the length of the signature. At most one node is created.
+        """
+        signature = transaction.signature
+        node = self._top
+        level = 0
+        parent_cells = None
+        parent_page = 0
+        while True:
+            prefix = node.prefix
+            if prefix:
+                if not signature.startswith(prefix, level):
+                    # The signature leaves this node's prefix: branch where they differ.
+                    # Both pages are found first, so an illegal signature leaves the node as it was.
+                    shared = 0
+                    while signature[level + shared] == prefix[shared]:
+                        shared += 1
+                    page = _page_of(signature[level + shared])
+                    node_page = _page_of(prefix[shared])
+                    branch = _RadixNode(prefix[:shared])
+                    node.prefix = prefix[shared + 1:]
+                    branch_cells = branch.cells.array
+                    branch_cells[node_page] = node
+                    branch_cells[page] = transaction
+                    branch_cells[PAGES + page] = amount
+                    parent_cells[parent_page] = branch
+                    self._length += 1
+                    return
+                level += len(prefix)
+
+            cells = node.cells.array
+            page = _page_of(signature[level])
+            entry = cells[page]
+            if entry is None:
+                cells[page] = transaction
+                cells[PAGES + page] = amount
+                self._length += 1
+                return
+            if type(entry) is _RadixNode:
+                parent_cells = cells
+                parent_page = page
+                node = entry
+                level += 1
+                continue
+
+            other_signature = entry.signature
+            if other_signature == signature:
+                if cells[PAGES + page] != amount:
+                    self._errors += 1
+                return
+
+            # Two leaves on one page: one node holding what they share, branching where they part
+            start = level + 1
+            end = start
+            while signature[end] == other_signature[end]:
+                end += 1
+            branch = _RadixNode(signature[start:end])
+            branch_cells = branch.cells.array
+            other_page = _page_of(other_signature[end])
+            branch_cells[other_page] = entry
+            branch_cells[PAGES + other_page] = cells[PAGES + page]
+            new_page = _page_of(signature[end])
+            branch_cells[new_page] = transaction
+            branch_cells[PAGES + new_page] = amount
+            cells[page] = branch
+            cells[PAGES + page] = None
+            self._length += 1
+            return
+
+    def __getitem__(self, transaction):
+        """
+        :raises KeyError: if the transaction is not in the book.
+        :complexity:
+            Best & Worst: O(L), L is the length of the signature.
+        """
+        signature = transaction.signature
+        node = self._top
+        level = 0
+        while True:
+            prefix = node.prefix
+            if prefix:
+                if not signature.startswith(prefix, level):
+                    raise KeyError("Transaction not found")
+                level += len(prefix)
+            cells = node.cells.array
+            page = _page_of(signature[level])
+            entry = cells[page]
+            if entry is None:
+                raise KeyError("Transaction not found")
+            if type(entry) is not _RadixNode:
+                if entry.signature == signature:
+                    return cells[PAGES + page]
+                raise KeyError("Transaction not found")
+            node = entry
+            level += 1
+
+    def __delitem__(self, transaction) -> None:
+        """
+        Remove a transaction. A node left with a single page is merged into its parent's page,
+        its prefix joining the prefix of what it held.
+        :raises KeyError: if the transaction is not in the book.
+        :complexity:
+            Best & Worst: O(L + P), L is the length of the signature and P = 36 pages.
+        """
+        signature = transaction.signature
+        node = self._top
+        level = 0
+        parent_cells = None
+        parent_page = 0
+        while True:
+            prefix = node.prefix
+            if prefix:
+                if not signature.startswith(prefix, level):
+                    raise KeyError("Transaction not found")
+                level += len(prefix)
+            cells = node.cells.array
+            page = _page_of(signature[level])
+            entry = cells[page]
+            if entry is None:
+                raise KeyError("Transaction not found")
+            if type(entry) is not _RadixNode:
+                if entry.signature != signature:
+                    raise KeyError("Transaction not found")
+                break
+            parent_cells = cells
+            parent_page = page
+            node = entry
+            level += 1
+
+        cells[page] = None
+        cells[PAGES + page] = None
+        self._length -= 1
+        if parent_cells is None:
+            return
+
+        remaining = -1
+        for page in range(PAGES):
+            if cells[page] is not None:
+                if remaining >= 0:
+                    return
+                remaining = page
+        entry = cells[remaining]
+        if type(entry) is _RadixNode:
+            entry.prefix = node.prefix + LEGAL_CHARACTERS[remaining] + entry.prefix
+            parent_cells[parent_page] = entry
+        else:
+            parent_cells[parent_page] = entry
+            parent_cells[PAGES + parent_page] = cells[PAGES + remaining]
+
+    def get_error_count(self) -> int:
+        return self._errors
+
+    def __len__(self) -> int:
+        return self._length
+
+    def node_count(self) -> int:
+        """
+        Number of nodes in the book, the top one included.
+        :complexity: O(M * P), M nodes of P = 36 pages.
+        """
+        count = 1
+        for _, _, entry in self._entries():
+            if type(entry) is _RadixNode:
+                count += 1
+        return count
+
+    def __iter__(self):
+        """
+        Yield (transaction, amount) for every transaction, in page order.
+        :complexity: O(M * P) for the whole iteration, M nodes of P = 36 pages.
+        """
+        for cells, page, entry in self._entries():
+            if type(entry) is not _RadixNode:
+                yield entry, cells[PAGES + page]
+
+    def _entries(self):
+        """
+        Yield (cells, page, entry) for every page in use below the top node, depth first in
+        page order, a node coming before what it holds. The path down is kept in two
+        depth-indexed ArrayRs, doubled if the book gets deeper than they are.
+        :complexity: O(M * P) for the whole iteration, M nodes of P = 36 pages.
+        """
+        # The cells of each node on the path down and the next page to look at there
+        path = ArrayR(INITIAL_DEPTH)
+        next_pages = ArrayR(INITIAL_DEPTH)
+        path[0] = self._top.cells
+        next_pages[0] = 0
+        depth = 0
+        while depth >= 0:
+            page = next_pages[depth]
+            if page == PAGES:
+                path[depth] = None
+                depth -= 1
+                continue
+            next_pages[depth] = page + 1
+            cells = path[depth].array
+            entry = cells[page]
+            if entry is None:
+                continue
+            yield cells, page, entry
+            if type(entry) is _RadixNode:
+                depth += 1
+                if depth == len(path):
+                    path = doubled(path)
+                    next_pages = doubled(next_pages)
+                path[depth] = entry.cells
+                next_pages[depth] = 0
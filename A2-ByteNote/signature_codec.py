@@ -0,0 +1,107 @@
+"""
+Conversions between the three forms of a transaction signature:
+    - the integer value of the signature hash (0 <= value < 36^36),
+    - the 36 character base-36 string stored in Transaction.signature,
+    - a 24 byte big-endian binary form, for compact storage.
+
+Big-endian keeps the binary form in the same order as the integer value.
+"""
+SIGNATURE_ALPHABET = "0123456789abcdefghijklmnopqrstuvwxyz"
+SIGNATURE_LENGTH = 36
+BINARY_LENGTH = 24
+MAX_VALUE = 36**SIGNATURE_LENGTH
+# Whether each ASCII character is a signature digit, indexed by its code point
+_IS_DIGIT_BY_ORD = tuple(chr(code) in SIGNATURE_ALPHABET for code in range(128))
+
+# Every 3 digit base-36 string, indexed by its value
+_CHUNK_DIGITS = 3
+_CHUNK_BASE = 36**_CHUNK_DIGITS
+_CHUNKS = tuple(a + b + c for a in SIGNATURE_ALPHABET for b in SIGNATURE_ALPHABET for c in SIGNATURE_ALPHABET)
+
+# The value is cut into 4 parts of 9 digits (3 chunks each) so most arithmetic is on small ints
+_PART_BASE = _CHUNK_BASE**3
+_HIGH_BASE = _PART_BASE**2
+
+
+def encode(value: int) -> str:
+    """
+    Encode a hash value as a 36 character base-36 string, zero padded on the left.
+    :raises ValueError: if the value is outside [0, 36^36).
+    :complexity:
+        Best & Worst: O(1), 3 divmods to split the value and 12 table reads.
+    """
+    if not 0 <= value < MAX_VALUE:
+        raise ValueError("Signature value out of range.")
+    chunks = _CHUNKS
+    high, low = divmod(value, _HIGH_BASE)
+    first, second = divmod(high, _PART_BASE)
+    third, fourth = divmod(low, _PART_BASE)
+    result = ""
+    for part in (first, second, third, fourth):
+        top, rest = divmod(part, _CHUNK_BASE * _CHUNK_BASE)
+        middle, bottom = divmod(rest, _CHUNK_BASE)
+        result += chunks[top] + chunks[middle] + chunks[bottom]
+    return result
+
+
+def _all_digits(signature: str) -> bool:
+    """
+    True if every character of the signature is one of 0-9 and a-z.
+    :complexity:
+        Best: O(1) when the first character is not a digit.
+        Worst: O(L), L is the length of the signature, one indexed read per character.
+    """
+    if not signature.isascii():
+        return False
+    for character in signature:
+        if not _IS_DIGIT_BY_ORD[ord(character)]:
+            return False
+    return True
+
+
+def is_canonical(signature: str) -> bool:
+    """
+    True if the signature is exactly what encode produces: 36 characters of 0-9 and a-z.
+    Only those survive a trip through the binary form unchanged.
+    :complexity:
+        Best & Worst: O(L), L is the length of the signature.
+    """
+    return len(signature) == SIGNATURE_LENGTH and _all_digits(signature)
+
+
+def decode(signature: str) -> int:
+    """
+    Decode a base-36 signature back into its hash value.
+    Only the characters 0-9 and a-z are accepted: no sign, whitespace, underscores or capitals,
+    which int(signature, 36) would otherwise let through.
+    :raises ValueError: if the signature is empty, longer than 36 characters,
+        or contains characters outside 0-9 and a-z.
+    :complexity:
+        Best & Worst: O(L), L is the length of the signature.
+    """
+    if not 0 < len(signature) <= SIGNATURE_LENGTH or not _all_digits(signature):
+        raise ValueError(f"Signatures are 1 to {SIGNATURE_LENGTH} characters of 0-9 and a-z.")
+    return int(signature, 36)
+
+
+def to_binary(signature: str) -> bytes:
+    """
+    Convert a signature string to its 24 byte form.
+    Shorter signatures are treated as zero padded, so from_binary gives back the padded string.
+    :raises ValueError: if the signature is not valid, see decode.
+    :complexity:
+        Best & Worst: O(L), L is the length of the signature.
+    """
+    return decode(signature).to_bytes(BINARY_LENGTH, "big")
+
+
+def from_binary(data: bytes) -> str:
+    """
+    Convert a 24 byte signature back to its 36 character string.
+    :raises ValueError: if data is not 24 bytes or holds a value outside [0, 36^36).
+    :complexity:
+        Best & Worst: O(1)
+    """
+    if len(data) != BINARY_LENGTH:
+        raise ValueError(f"Binary signatures are {BINARY_LENGTH} bytes long.")
+    return encode(int.from_bytes(data, "big"))
@@ -0,0 +1,153 @@
+"""
+A stack of transactions that keeps at most one segment in memory and spills the rest to disk.
+
+Pushed transactions fill an in-memory segment of fixed size. When it is full, the segment is
+written to a temporary file in the binary transaction format (see transaction_file) and a new
+segment is started. Pops take from the in-memory segment; when it runs out, the most recently
+spilled file is read back in and deleted. So memory stays flat however many transactions are
+pushed, and the pop order is the same as any other stack.
+
+Transactions that went through a file come back as new Transaction objects with the same
+fields and the same signature (or none, if they were not signed), rather than the objects
+that were pushed. Spilling never signs anything.
+"""
+import os
+import tempfile
+
+from data_structures.abstract_stack import Stack
+from data_structures.chunked_stack import ChunkedStack
+from data_structures.referential_array import ArrayR
+
+from processing_line import Transaction
+from transaction_file import TransactionFile, TransactionFileWriter
+
+
+class SpillingTransactionStack(Stack[Transaction]):
+    """
+    Unless stated otherwise, all methods have O(1) complexity (amortised over a segment).
+    """
+
+    DEFAULT_SEGMENT_SIZE = 65536
+
+    def __init__(self, segment_size: int = DEFAULT_SEGMENT_SIZE, directory: str | None = None) -> None:
+        """
+        :param segment_size: transactions kept in memory before spilling.
+        :param directory: where the temporary spill directory is created, defaults to the system one.
+        """
+        if segment_size <= 0:
+            raise ValueError("Segment size must be positive.")
+        self.__segment = ArrayR(segment_size)
+        self.__top = 0
+        # Paths of spilled segment files, the most recent on top
+        self.__spilled = ChunkedStack(16)
+        self.__spilled_count = 0
+        self.__directory = directory
+        self.__spill_dir = None
+
+    def push(self, item: Transaction) -> None:
+        """
+        :complexity:
+            Best: O(1) when the segment has room.
+            Worst: O(S) when the full segment of S transactions is written to disk first.
+        """
+        if self.__top == len(self.__segment):
+            self.__spill()
+        self.__segment[self.__top] = item
+        self.__top += 1
+
+    def pop(self) -> Transaction:
+        """
+        :complexity:
+            Best: O(1) when the in-memory segment is not empty.
+            Worst: O(S) when a spilled segment of S transactions is read back first.
+        :raises Exception: if the stack is empty
+        """
+        if self.__top == 0:
+            if self.__spilled.is_empty():
+                raise Exception('Stack is empty')
+            self.__restore()
+        self.__top -= 1
+        item = self.__segment[self.__top]
+        self.__segment[self.__top] = None
+        return item
+
+    def peek(self) -> Transaction:
+        """
+        :raises Exception: if the stack is empty
+        """
+        if self.__top == 0:
+            if self.__spilled.is_empty():
+                raise Exception('Stack is empty')
+            self.__restore()
+        return self.__segment[self.__top - 1]
+
+    def __spill(self) -> None:
+        """
+        Write the in-memory segment to a new file and empty it.
+        :complexity: O(S), S is the segment size.
+        """
+        if self.__spill_dir is None:
+            self.__spill_dir = tempfile.TemporaryDirectory(prefix="spill_stack_", dir=self.__directory)
+        path = os.path.join(self.__spill_dir.name, f"segment_{len(self.__spilled)}.bntx")
+        with TransactionFileWriter(path) as writer:
+            for index in range(self.__top):
+                writer.write(self.__segment[index])
+                self.__segment[index] = None
+        self.__spilled.push(path)
+        self.__spilled_count += self.__top
+        self.__top = 0
+
+    def __restore(self) -> None:
+        """
+        Read the most recently spilled segment back into memory and delete its file.
+        :pre: the in-memory segment is empty.
+        :complexity: O(S), S is the segment size.
+        """
+        path = self.__spilled.pop()
+        with TransactionFile(path) as records:
+            for transaction in records:
+                self.__segment[self.__top] = transaction
+                self.__top += 1
+        os.remove(path)
+        self.__spilled_count -= self.__top
+        if self.__spilled.is_empty():
+            self.__remove_spill_dir()
+
+    def __iter__(self):
+        """
+        Yield the transactions in pop order without removing them,
+        reading spilled segments backwards straight from their files.
+        :complexity: O(N) for the whole iteration.
+        """
+        for index in range(self.__top - 1, -1, -1):
+            yield self.__segment[index]
+        for path in self.__spilled:
+            with TransactionFile(path) as records:
+                for index in range(len(records) - 1, -1, -1):
+                    yield records[index]
+
+    @property
+    def spilled_segments(self) -> int:
+        """ Number of segments currently on disk. """
+        return len(self.__spilled)
+
+    def clear(self) -> None:
+        """ Empties the stack and removes the spill files. """
+        for index in range(self.__top):
+            self.__segment[index] = None
+        self.__top = 0
+        self.__spilled.clear()
+        self.__spilled_count = 0
+        self.__remove_spill_dir()
+
+    def __remove_spill_dir(self) -> None:
+        """ Delete the spill directory, if there is one; a later spill creates a new one. """
+        if self.__spill_dir is not None:
+            self.__spill_dir.cleanup()
+            self.__spill_dir = None
+
+    def __len__(self) -> int:
+        return self.__top + self.__spilled_count
+
+    def __str__(self) -> str:
+        return f"<SpillingTransactionStack {len(self)} transactions, {len(self.__spilled)} segments on disk>"
@@ -1,11 +1,41 @@
 from unittest import TestCase
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import ast
 import inspect
 
-from tests.helper import CollectionsFinder
+from tests.helper import CollectionsFinder, take_out_from_adt
 
 
-from processing_line import ProcessingLine, Transaction
+from processing_line import NOT_READY, ProcessingLine, Transaction
+import signature_codec
+from data_structures import ArrayR
+from transaction_batch import TransactionBatch
+from user_registry import UserRegistry
+from transaction_file import TransactionFile, write_transactions
+from partitioned_line import PartitionedProcessingLine
+from async_line import AsyncProcessingLine
+from concurrent_line import ConcurrentProcessingLine
+from line_merge import MergedTransactionIterator
+from line_checkpoint import checkpointing, resume
+from ingestion import IngestionStats, ingest_into_line, read_csv, read_jsonl
+
+
+class SlowExecutor(ThreadPoolExecutor):
+    """ Signs like any executor, but every task takes a while to finish. """
+
+    def submit(self, fn, *args, **kwargs):
+        return super().submit(_slowly, fn, *args, **kwargs)
+
+
+def _slowly(fn, *args, **kwargs):
+    time.sleep(0.05)
+    return fn(*args, **kwargs)
 
 
 class TestTask1Setup(TestCase):
@@ -43,7 +73,904 @@ class TestTask1(TestTask1Setup):
                 self.fail("Iterator returned more transactions than expected.")
         
         self.assertEqual(counter, 3, "Line iterator should've returned exactly 3 transactions.")
-    
+
+    def test_line_contents_can_be_taken_out(self):
+        """
+        #name(The test helper reads the line's queue and stack without changing them)
+        """
+        line = ProcessingLine(Transaction(100, "bank", "bank"))
+        for timestamp in (150, 20, 130, 40):
+            line.add_transaction(Transaction(timestamp, "user", "bank"))
+
+        self.assertEqual([tx.timestamp for tx in take_out_from_adt(line._before_critical)], [20, 40])
+        self.assertEqual([tx.timestamp for tx in take_out_from_adt(line._after_critical)], [130, 150])
+        self.assertEqual([tx.timestamp for tx in line], [20, 40, 100, 130, 150])
+
+    def test_chunked_line_matches_linked_line(self):
+        """
+        #name(A line on chunked ADTs gives the same order, and remaining() reads either without changing it)
+        """
+        timestamps = [(index * 37) % 1000 for index in range(1000)]
+        orders = []
+        for chunked in (False, True):
+            line = ProcessingLine(Transaction(500, "bank", "bank"), chunked=chunked)
+            for timestamp in timestamps:
+                line.add_transaction(Transaction(timestamp, "user", "bank"))
+            line_iterator = iter(line)
+            for _ in range(3):
+                next(line_iterator)
+            remaining = line_iterator.remaining()
+            # stop halfway through the stack, which must still be whole afterwards
+            for _ in range(700):
+                next(remaining)
+            remaining.close()
+            left = [tx.timestamp for tx in line_iterator.remaining()]
+            self.assertEqual(left, [tx.timestamp for tx in line_iterator])
+            orders.append(left)
+        self.assertEqual(orders[0], orders[1])
+        self.assertEqual(len(orders[0]), 998)
+
+    def test_remaining_interleaved_with_next(self):
+        """
+        #name(Taking transactions while a remaining() generator is open loses none of them)
+        """
+        for chunked in (False, True):
+            line = ProcessingLine(Transaction(5, "bank", "bank"), chunked=chunked)
+            for timestamp in (1, 2, 5, 6, 7, 8, 9):
+                line.add_transaction(Transaction(timestamp, "user", "bank"))
+            line_iterator = iter(line)
+            remaining = line_iterator.remaining()
+            seen = [next(remaining).timestamp for _ in range(5)]
+            processed = [tx.timestamp for tx in line_iterator]
+            seen.extend(tx.timestamp for tx in remaining)
+            self.assertEqual(processed, [1, 2, 5, 5, 9, 8, 7, 6])
+            self.assertEqual(seen, processed)
+
+    def test_streaming_line_overlaps_adding(self):
+        """
+        #name(Streaming line serves before-critical transactions while still open)
+        """
+        critical = Transaction(100, "bob", "dave")
+        early = Transaction(50, "alice", "bob")
+        later_before = Transaction(70, "carol", "bob")
+        after = Transaction(120, "dave", "frank")
+
+        line = ProcessingLine(critical, streaming=True)
+        line.add_transaction(early)
+        line_iterator = iter(line)
+        self.assertIs(line_iterator.poll(), early)
+        self.assertIs(line_iterator.poll(), NOT_READY)
+
+        line.add_transaction(after)
+        line.add_transaction(later_before)
+        self.assertIs(line_iterator.poll(), later_before)
+        self.assertIs(line_iterator.poll(), NOT_READY)
+        self.assertEqual(len(line_iterator.next_batch(4)), 0)
+
+        line.close()
+        with self.assertRaises(RuntimeError):
+            line.add_transaction(Transaction(60, "x", "y"))
+        self.assertEqual(list(line_iterator), [critical, after])
+        with self.assertRaises(StopIteration):
+            line_iterator.poll()
+
+    def test_open_streaming_line_never_stops_early(self):
+        """
+        #name(next() on an open streaming line with nothing ready raises instead of stopping, so iteration stays terminal)
+        """
+        line = ProcessingLine(Transaction(100, "bank", "bank"), streaming=True)
+        line.add_transaction(Transaction(50, "alice", "bob"))
+        line_iterator = iter(line)
+        with self.assertRaises(RuntimeError):
+            list(line_iterator)
+        with self.assertRaises(RuntimeError):
+            next(line_iterator)
+        line.add_transaction(Transaction(70, "carol", "bob"))
+        line.close()
+        self.assertEqual([tx.timestamp for tx in line_iterator], [70, 100])
+        for _ in range(2):
+            with self.assertRaises(StopIteration):
+                next(line_iterator)
+
+    def test_spilling_line_keeps_order(self):
+        """
+        #name(Line that spills after-critical transactions to disk keeps the output order)
+        """
+        critical = Transaction(100, "bob", "dave")
+        line = ProcessingLine(critical, spill_segment_size=4)
+        for timestamp in (150, 90, 101, 130, 120, 80, 170, 140, 110, 160, 105):
+            line.add_transaction(Transaction(timestamp, f"user{timestamp}", "bank"))
+        self.assertEqual(line._after_critical.spilled_segments, 2)
+
+        processed = list(line)
+        self.assertEqual(
+            [tx.timestamp for tx in processed],
+            [90, 80, 100, 105, 160, 110, 140, 170, 120, 130, 101, 150],
+        )
+        for transaction in processed:
+            expected = Transaction(transaction.timestamp, transaction.from_user, transaction.to_user)
+            expected.sign()
+            self.assertEqual(transaction.signature, expected.signature)
+
+    def test_spilling_line_keeps_signatures_as_set(self):
+        """
+        #name(Spilled transactions keep a signature set by hand and are not signed by spilling)
+        """
+        line = ProcessingLine(Transaction(100, "bob", "dave"), spill_segment_size=1)
+        manual = Transaction(110, "alice", "bob")
+        manual.signature = "xxxab"
+        signed = Transaction(120, "carol", "bob")
+        signed.sign()
+        unsigned = Transaction(130, "dave", "bob")
+        for transaction in (manual, signed, unsigned):
+            line.add_transaction(transaction)
+        self.assertEqual(line._after_critical.spilled_segments, 2)
+        self.assertFalse(unsigned.is_signed)
+
+        line_iterator = iter(line)
+        self.assertEqual(next(line_iterator).timestamp, 100)
+        back = {transaction.timestamp: transaction for transaction in line_iterator}
+        self.assertEqual(back[110].signature, "xxxab")
+        self.assertTrue(back[120].is_signed)
+        self.assertEqual(back[120].signature, signed.signature)
+        self.assertEqual(back[130].signature, Transaction(130, "dave", "bob").signature)
+
+    def test_partitioned_line_routes_by_critical(self):
+        """
+        #name(Partitioned line routes transactions to the right critical and iterates in order)
+        """
+        criticals = [Transaction(300, "c", "c"), Transaction(100, "a", "a"), Transaction(200, "b", "b")]
+        lines = PartitionedProcessingLine(criticals)
+        self.assertEqual([lines.partition_of(t) for t in (50, 100, 101, 250, 300, 999)], [0, 0, 1, 2, 2, 2])
+
+        for timestamp in (350, 150, 50, 250, 120, 320, 90):
+            lines.add_transaction(Transaction(timestamp, "x", "y"))
+        self.assertEqual(
+            [tx.timestamp for tx in lines],
+            [50, 90, 100, 150, 120, 200, 250, 300, 320, 350],
+        )
+
+    def test_concurrent_line_blocks_until_closed(self):
+        """
+        #name(Concurrent line takes adds from several threads and blocks its consumer)
+        """
+        critical = Transaction(1000, "bank", "bank")
+        line = ConcurrentProcessingLine(critical, timeout=5)
+        line_iterator = iter(line)
+
+        def produce(offset):
+            for timestamp in range(offset, 2000, 4):
+                line.add_transaction(Transaction(timestamp, "user", "bank"))
+
+        producers = [threading.Thread(target=produce, args=(offset,)) for offset in range(4)]
+        for producer in producers:
+            producer.start()
+        for producer in producers:
+            producer.join()
+        line.close()
+
+        processed = [tx.timestamp for tx in line_iterator]
+        self.assertEqual(len(processed), 2001)
+        self.assertEqual(processed[1001], 1000)
+        for offset in range(4):
+            # each producer's transactions keep FIFO order before the critical and LIFO after it
+            self.assertEqual([t for t in processed[:1001] if t % 4 == offset], list(range(offset, 1001, 4)))
+            self.assertEqual(
+                [t for t in processed[1002:] if t % 4 == offset],
+                [t for t in range(1999, 1000, -1) if t % 4 == offset],
+            )
+
+        waiting = ConcurrentProcessingLine(critical, timeout=0.01)
+        with self.assertRaises(TimeoutError):
+            next(iter(waiting))
+        with self.assertRaises(TimeoutError):
+            next(ConcurrentProcessingLine(critical, timeout=0.01).iterator())
+        with self.assertRaises(ValueError):
+            ConcurrentProcessingLine(critical).iterator(prefetch=4)
+
+    def test_concurrent_next_batch_keeps_partial_batch(self):
+        """
+        #name(A batch from a concurrent line returns what is ready instead of timing out)
+        """
+        line = ConcurrentProcessingLine(Transaction(100, "bank", "bank"), timeout=0.05)
+        line.add_transaction(Transaction(10, "user", "bank"))
+        line.add_transaction(Transaction(20, "user", "bank"))
+        line_iterator = iter(line)
+
+        self.assertEqual([tx.timestamp for tx in line_iterator.next_batch(5)], [10, 20])
+        with self.assertRaises(TimeoutError):
+            line_iterator.next_batch(5)
+        line.add_transaction(Transaction(30, "user", "bank"))
+        line.close()
+        self.assertEqual([tx.timestamp for tx in line_iterator.next_batch(5)], [30, 100])
+        self.assertEqual(len(line_iterator.next_batch(5)), 0)
+
+    def test_prefetching_iterator_keeps_order(self):
+        """
+        #name(Prefetching iterator returns the same transactions in the same order, signed)
+        """
+        def build_line():
+            line = ProcessingLine(Transaction(100, "bank", "bank"))
+            for timestamp in (150, 20, 130, 40, 110, 60, 170, 80, 190, 100, 5):
+                line.add_transaction(Transaction(timestamp, f"user{timestamp}", "bank"))
+            return line
+
+        expected = [(tx.timestamp, tx.signature) for tx in build_line()]
+        with ThreadPoolExecutor(2) as executor:
+            line_iterator = build_line().iterator(prefetch=4, executor=executor)
+            processed = []
+            for transaction in line_iterator:
+                self.assertTrue(transaction.is_signed)
+                processed.append((transaction.timestamp, transaction.signature))
+        self.assertEqual(processed, expected)
+
+        processed = [(tx.timestamp, tx.signature) for tx in build_line().iterator(prefetch=3)]
+        self.assertEqual(processed, expected)
+
+        streaming = ProcessingLine(Transaction(100, "bank", "bank"), streaming=True)
+        with self.assertRaises(ValueError):
+            streaming.iterator(prefetch=4)
+        streaming.add_transaction(Transaction(20, "user", "bank"))
+        streaming.close()
+        self.assertEqual([tx.timestamp for tx in streaming.iterator(prefetch=4)], [20, 100])
+
+    def test_prefetching_iterator_carries_on_after_close(self):
+        """
+        #name(Closing a prefetching iterator early still returns every transaction, in order and signed)
+        """
+        def build_line():
+            line = ProcessingLine(Transaction(100, "bank", "bank"))
+            for timestamp in range(0, 200, 10):
+                line.add_transaction(Transaction(timestamp, f"user{timestamp}", "bank"))
+            return line
+
+        expected = [(tx.timestamp, tx.signature) for tx in build_line()]
+        with SlowExecutor(1) as executor:
+            line_iterator = build_line().iterator(prefetch=8, executor=executor)
+            processed = [next(line_iterator)]
+            # the feeder stops with chunks taken from the line but not signed yet
+            line_iterator.close()
+            processed.extend(line_iterator)
+        self.assertTrue(all(transaction.is_signed for transaction in processed))
+        self.assertEqual([(tx.timestamp, tx.signature) for tx in processed], expected)
+
+        line_iterator = build_line().iterator(prefetch=8)
+        line_iterator.close()
+        self.assertEqual([(tx.timestamp, tx.signature) for tx in line_iterator], expected)
+
+    def test_prefetching_iterator_serves_while_remaining_is_open(self):
+        """
+        #name(next() on a prefetching iterator does not wait forever while remaining() pauses the feeder)
+        """
+        line = ProcessingLine(Transaction(1000, "bank", "bank"))
+        for timestamp in range(0, 400, 10):
+            line.add_transaction(Transaction(timestamp, f"user{timestamp}", "bank"))
+        processed = []
+        with ThreadPoolExecutor(2) as executor:
+            line_iterator = line.iterator(prefetch=8, executor=executor)
+            processed.append(next(line_iterator))
+            remaining = line_iterator.remaining()
+            next(remaining)
+            consumer = threading.Thread(target=lambda: processed.extend(line_iterator), daemon=True)
+            consumer.start()
+            consumer.join(timeout=10)
+            self.assertFalse(consumer.is_alive())
+            remaining.close()
+        self.assertEqual([tx.timestamp for tx in processed], list(range(0, 400, 10)) + [1000])
+        self.assertTrue(all(tx.signature == Transaction(tx.timestamp, tx.from_user, tx.to_user).signature
+                            for tx in processed))
+
+    def test_dropped_prefetching_iterator_stops_feeder(self):
+        """
+        #name(A prefetching iterator dropped halfway without close() stops its feeder and its pool)
+        """
+        import gc
+        line = ProcessingLine(Transaction(1000, "bank", "bank"))
+        for timestamp in range(0, 1000, 10):
+            line.add_transaction(Transaction(timestamp, f"user{timestamp}", "bank"))
+        line_iterator = line.iterator(prefetch=8)
+        for _ in range(50):
+            next(line_iterator)
+        feeder = line_iterator._feeder
+        executor = line_iterator._executor
+        self.assertTrue(feeder.is_alive())
+
+        del line_iterator
+        gc.collect()
+        feeder.join(timeout=10)
+        self.assertFalse(feeder.is_alive())
+        with self.assertRaises(RuntimeError):
+            executor.submit(int)
+
+    def test_batch_add_and_next_batch(self):
+        """
+        #name(Transactions can be added and taken from a line in batches)
+        """
+        line = ProcessingLine(Transaction(100, "bank", "bank"))
+        line.add_transactions(Transaction(timestamp, "user", "bank") for timestamp in (150, 20, 130, 40))
+        line_iterator = iter(line)
+        with self.assertRaises(RuntimeError):
+            line.add_transactions([Transaction(1, "x", "y")])
+
+        first = line_iterator.next_batch(3)
+        self.assertIsInstance(first, ArrayR)
+        self.assertEqual([tx.timestamp for tx in first], [20, 40, 100])
+        self.assertTrue(all(tx.is_signed for tx in first))
+        self.assertEqual([tx.timestamp for tx in line_iterator.next_batch(3)], [130, 150])
+        self.assertEqual(len(line_iterator.next_batch(3)), 0)
+
+    def test_merge_of_ordered_lines(self):
+        """
+        #name(Ordered lines are merged into one timestamp-ordered stream)
+        """
+        shards = ([1, 4, 9, 12], [2, 3, 10], [], [4, 5, 6, 20])
+        line_iterators = []
+        for timestamps in shards:
+            line = ProcessingLine(Transaction(100, "bank", "bank"))
+            for timestamp in timestamps:
+                line.add_transaction(Transaction(timestamp, "user", "bank"))
+            line_iterators.append(iter(line))
+
+        merged = [tx.timestamp for tx in MergedTransactionIterator(line_iterators)]
+        self.assertEqual(merged, sorted([t for timestamps in shards for t in timestamps] + [100] * 4))
+        self.assertEqual(list(MergedTransactionIterator([])), [])
+
+    def test_merge_of_streaming_lines_loses_nothing(self):
+        """
+        #name(Open streaming lines are rejected by the merge, concurrent lines are merged as they fill)
+        """
+        open_line = ProcessingLine(Transaction(100, "bank", "bank"), streaming=True)
+        open_line.add_transaction(Transaction(1, "user", "bank"))
+        open_iterator = iter(open_line)
+        with self.assertRaises(ValueError):
+            MergedTransactionIterator([[Transaction(2, "user", "bank")], open_iterator])
+        open_line.add_transaction(Transaction(3, "user", "bank"))
+        open_line.close()
+
+        concurrent = ConcurrentProcessingLine(Transaction(100, "bank", "bank"), timeout=5)
+        concurrent.add_transaction(Transaction(2, "user", "bank"))
+
+        def produce():
+            time.sleep(0.05)
+            concurrent.add_transaction(Transaction(4, "user", "bank"))
+            concurrent.close()
+
+        producer = threading.Thread(target=produce)
+        producer.start()
+        merged = [tx.timestamp for tx in MergedTransactionIterator([open_iterator, concurrent])]
+        producer.join()
+        self.assertEqual(merged, [1, 2, 3, 4, 100, 100])
+
+    def test_checkpoint_and_resume(self):
+        """
+        #name(A line iterator can be checkpointed and resumed from the file)
+        """
+        def build_line():
+            line = ProcessingLine(Transaction(100, "bank", "bank"), spill_segment_size=2)
+            for timestamp in (150, 20, 130, 40, 110, 60, 170):
+                line.add_transaction(Transaction(timestamp, f"user{timestamp}", "bank"))
+            return line
+
+        expected = [(tx.timestamp, tx.from_user, tx.signature) for tx in build_line()]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "line.ckpt")
+            with ThreadPoolExecutor(1) as executor:
+                with build_line().iterator(prefetch=2, executor=executor) as line_iterator:
+                    done = [next(line_iterator), next(line_iterator)]
+                    self.assertEqual(line_iterator.checkpoint(path), 6)
+
+            with resume(path) as resumed:
+                self.assertEqual(len(resumed), 6)
+                rest = [next(resumed) for _ in range(2)]
+                resumed.checkpoint(path)
+                rest += list(resumed)
+            self.assertEqual([(tx.timestamp, tx.from_user, tx.signature) for tx in done + rest], expected)
+
+            with resume(path) as resumed:
+                again = list(checkpointing(resumed, path, every=3))
+            self.assertEqual([tx.timestamp for tx in again], [t for t, _, _ in expected[4:]])
+            with resume(path) as resumed:
+                self.assertEqual([tx.timestamp for tx in resumed], [t for t, _, _ in expected[-1:]])
+
+    def test_instrumented_line_records_stages(self):
+        """
+        #name(An instrumented line counts stages, depths and signing times)
+        """
+        self.assertIsNone(ProcessingLine(Transaction(1, "a", "b")).stats)
+
+        line = ProcessingLine(Transaction(100, "bank", "bank"), instrument=True)
+        for timestamp in (150, 20, 130, 40, 110):
+            line.add_transaction(Transaction(timestamp, "user", "bank"))
+        processed = []
+        for transaction in line:
+            self.assertTrue(transaction.is_signed)
+            processed.append(transaction.timestamp)
+        self.assertEqual(processed, [20, 40, 100, 110, 130, 150])
+
+        stats = line.stats.as_dict()
+        self.assertEqual(stats["stages"], {"before": 2, "critical": 1, "after": 3})
+        self.assertEqual(stats["items"], 6)
+        self.assertEqual(stats["high_water"], {"before": 2, "after": 3})
+        self.assertEqual(stats["signing"]["count"], 6)
+        self.assertEqual(sum(stats["signing"]["buckets"].values()), 6)
+        self.assertEqual(stats["next"]["count"], 6)
+        self.assertGreater(stats["items_per_second"], 0)
+
+    def test_async_line_with_many_producers(self):
+        """
+        #name(Async line takes many producer coroutines and signs off the event loop)
+        """
+        async def scenario():
+            critical = Transaction(500, "bank", "bank")
+            line = AsyncProcessingLine(critical)
+            processed = []
+
+            async def consume():
+                async for transaction in line:
+                    self.assertTrue(transaction.is_signed)
+                    processed.append(transaction.timestamp)
+
+            consumer = asyncio.create_task(consume())
+            await asyncio.gather(*(line.add_transaction(Transaction(t, "user", "bank")) for t in range(1000)))
+            line.close()
+            await consumer
+            return processed
+
+        processed = asyncio.run(scenario())
+        self.assertEqual(len(processed), 1001)
+        self.assertEqual(processed[501], 500)
+        self.assertEqual(sorted(processed[:501]), list(range(501)))
+        self.assertEqual(sorted(processed[502:]), list(range(501, 1000)))
+
+    def test_async_line_close_keeps_adds_in_flight(self):
+        """
+        #name(Closing an async line while adds are still signing adds them instead of failing them)
+        """
+        async def scenario(executor):
+            line = AsyncProcessingLine(Transaction(100, "bank", "bank"), executor=executor)
+            adds = [asyncio.create_task(line.add_transaction(Transaction(t, "user", "bank"))) for t in (10, 150)]
+            await asyncio.sleep(0)
+            line.close()
+            self.assertTrue(line.is_closed)
+            with self.assertRaises(RuntimeError):
+                await line.add_transaction(Transaction(20, "user", "bank"))
+            processed = [transaction.timestamp async for transaction in line]
+            await asyncio.gather(*adds)
+
+            other = AsyncProcessingLine(Transaction(100, "bank", "bank"), executor=executor)
+            add = asyncio.create_task(other.add_transaction(Transaction(30, "user", "bank")))
+            await asyncio.sleep(0)
+            await other.aclose()
+            self.assertTrue(add.done())
+            return processed, [transaction.timestamp async for transaction in other]
+
+        with SlowExecutor(2) as executor:
+            processed, other = asyncio.run(asyncio.wait_for(scenario(executor), timeout=10))
+        self.assertEqual(processed, [10, 100, 150])
+        self.assertEqual(other, [30, 100])
+
+    def test_async_line_signs_many_pairs_on_threads(self):
+        """
+        #name(Async line signs correctly on a thread pool with many user pairs)
+        """
+        def reference_signature(transaction):
+            value = 0
+            for char in f"{transaction.timestamp}|{transaction.from_user}|{transaction.to_user}":
+                value = (value * 31 + ord(char)) % 36**36
+            return signature_codec.encode(value)
+
+        async def scenario(executor, count, pairs):
+            line = AsyncProcessingLine(Transaction(count, "bank", "bank"), executor=executor)
+            transactions = [Transaction(t, f"u{t % pairs}", "bank") for t in range(count)]
+            for start in range(0, count, 500):
+                await asyncio.gather(*(line.add_transaction(tx) for tx in transactions[start:start + 500]))
+            line.close()
+            return [transaction async for transaction in line]
+
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            count = 10000
+            with ThreadPoolExecutor(8) as executor:
+                processed = asyncio.run(scenario(executor, count, 5000))
+            self.assertEqual(len(processed), count + 1)
+            for transaction in processed:
+                self.assertEqual(transaction.signature, reference_signature(transaction))
+        finally:
+            sys.setswitchinterval(interval)
+
+    def test_sign_many_matches_sign(self):
+        """
+        #name(Bulk signing gives the same signatures as sign)
+        """
+        transactions = [Transaction(1000 + i, f"user{i % 7}", f"user{i % 5}") for i in range(40)]
+        expected = [Transaction(tx.timestamp, tx.from_user, tx.to_user) for tx in transactions]
+        for tx in expected:
+            tx.sign()
+
+        Transaction.sign_many(transactions, workers=2, chunk_size=8)
+
+        self.assertEqual([tx.signature for tx in transactions], [tx.signature for tx in expected])
+
+        # an iterable without a length is gathered first, and signed all the same
+        unsized = [Transaction(tx.timestamp, tx.from_user, tx.to_user) for tx in expected]
+        Transaction.sign_many((tx for tx in unsized), workers=2, chunk_size=8)
+        self.assertEqual([tx.signature for tx in unsized], [tx.signature for tx in expected])
+
+    def test_next_batch_reuses_the_iterator_executor(self):
+        """
+        #name(Big batches are signed on the iterator's executor instead of a new pool each)
+        """
+        import processing_line
+        critical = Transaction(1000, "bank", "bank")
+        expected = [Transaction(900 - i, f"user{i % 7}", "bank") for i in range(40)]
+        for tx in expected:
+            tx.sign()
+        line = ProcessingLine(critical)
+        for tx in expected:
+            line.add_transaction(Transaction(tx.timestamp, tx.from_user, tx.to_user))
+
+        chunk_size = Transaction.SIGN_CHUNK_SIZE
+        pool_type = processing_line.ProcessPoolExecutor
+        Transaction.SIGN_CHUNK_SIZE = 8
+        processing_line.ProcessPoolExecutor = None  # starting a pool would fail
+        try:
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                line_iterator = line.iterator(executor=executor)
+                batches = [line_iterator.next_batch(20), line_iterator.next_batch(20)]
+        finally:
+            Transaction.SIGN_CHUNK_SIZE = chunk_size
+            processing_line.ProcessPoolExecutor = pool_type
+
+        self.assertEqual([tx.signature for batch in batches for tx in batch],
+                         [tx.signature for tx in expected])
+
+    def test_user_registry_shared_by_threads(self):
+        """
+        #name(Threads registering the same users get one id per user)
+        """
+        registry = UserRegistry()
+        names = [f"user{index}" for index in range(20000)]
+        seen = [None] * 8
+
+        def work(slot):
+            seen[slot] = [registry.intern(name) for name in names]
+
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            workers = [threading.Thread(target=work, args=(slot,)) for slot in range(8)]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+        finally:
+            sys.setswitchinterval(interval)
+        self.assertEqual(len(registry), len(names))
+        self.assertEqual(sorted(seen[0]), list(range(len(names))))
+        for ids in seen[1:]:
+            self.assertEqual(ids, seen[0])
+        self.assertEqual([registry.name(user_id) for user_id in seen[0]], names)
+        self.assertEqual(registry.misses, len(names))
+        self.assertEqual(registry.hits, 7 * len(names))
+
+        first_id, first, second_id, second = registry.intern_pair("user1", "someone new")
+        self.assertEqual((first_id, second_id), (1, len(names)))
+        self.assertIs(first, registry.name(1))
+        self.assertEqual(second, "someone new")
+        with self.assertRaises(IndexError):
+            registry.name(len(names) + 1)
+
+    def test_user_registry_grows_past_a_million_names(self):
+        """
+        #name(A registry without a limit keeps registering names past a million)
+        """
+        registry = UserRegistry()
+        count = 1_100_000
+        for index in range(count):
+            registry.intern(f"user{index}")
+        self.assertEqual(len(registry), count)
+        self.assertEqual(registry.misses, count)
+        for index in (0, 786_433, 786_435, count - 1):
+            self.assertEqual(registry.intern(f"user{index}"), index)
+            self.assertEqual(registry.name(index), f"user{index}")
+        self.assertEqual(registry.intern_pair("user5", "user1099999")[::2], (5, count - 1))
+
+    def test_full_user_registry_raises(self):
+        """
+        #name(A full registry raises for new names and keeps the ones it has)
+        """
+        registry = UserRegistry(2)
+        self.assertEqual((registry.intern("alice"), registry.intern("bob")), (0, 1))
+        with self.assertRaises(RuntimeError):
+            registry.intern("carol")
+        with self.assertRaises(RuntimeError):
+            registry.canonical("carol")
+        with self.assertRaises(RuntimeError):
+            Transaction(50, "bob", "carol", registry)
+        self.assertEqual(registry.intern_pair("bob", "alice")[::2], (1, 0))
+        self.assertEqual((len(registry), registry.capacity), (2, 2))
+        self.assertNotIn("carol", registry)
+        with self.assertRaises(ValueError):
+            UserRegistry(0)
+
+        # neither name of a pair is registered when only one of them fits
+        registry = UserRegistry(2)
+        registry.intern("alice")
+        with self.assertRaises(RuntimeError):
+            registry.intern_pair("bob", "carol")
+        self.assertEqual(len(registry), 1)
+        self.assertEqual(registry.intern_pair("bob", "bob")[::2], (1, 1))
+
+    def test_signature_is_lazy_and_invalidated(self):
+        """
+        #name(Signature is computed on first access and recomputed after a change)
+        """
+        transaction = Transaction(50, "alice", "bob")
+        self.assertFalse(transaction.is_signed)
+        first = transaction.signature
+        self.assertTrue(transaction.is_signed)
+        self.assertIs(transaction.signature, first)
+
+        transaction.to_user = "carol"
+        self.assertFalse(transaction.is_signed)
+        expected = Transaction(50, "alice", "carol")
+        expected.sign()
+        self.assertEqual(transaction.signature, expected.signature)
+        self.assertNotEqual(transaction.signature, first)
+
+    def test_transaction_user_ids_are_stored(self):
+        """
+        #name(Transaction user ids are kept on the transaction and follow user changes)
+        """
+        registry = UserRegistry()
+        transaction = Transaction(50, "alice", "bob", registry)
+        other = Transaction(60, "bob", "alice", registry)
+        self.assertEqual(transaction.from_user_id, other.to_user_id)
+        self.assertEqual(transaction.to_user_id, other.from_user_id)
+        self.assertIs(transaction.registry, registry)
+
+        hits = registry.hits
+        for _ in range(10):
+            transaction.from_user_id
+            transaction.to_user_id
+        self.assertEqual(registry.hits, hits)
+
+        transaction.from_user = "".join(("b", "ob"))
+        self.assertEqual(transaction.from_user_id, other.from_user_id)
+        self.assertIs(transaction.from_user, other.from_user)
+
+        # without a registry nothing is interned anywhere
+        plain = Transaction(70, "carol", "dave")
+        self.assertEqual((plain.from_user_id, plain.to_user_id, plain.registry), (-1, -1, None))
+        plain.to_user = "erin"
+        self.assertEqual((plain.to_user, plain.to_user_id), ("erin", -1))
+        self.assertNotIn("carol", registry)
+
+    def test_signature_codec_round_trip(self):
+        """
+        #name(Signature codec converts between string, int and binary forms)
+        """
+        transaction = Transaction(50, "alice", "bob")
+        transaction.sign()
+        value = signature_codec.decode(transaction.signature)
+
+        self.assertEqual(signature_codec.encode(value), transaction.signature)
+        self.assertEqual(len(transaction.binary_signature), signature_codec.BINARY_LENGTH)
+        self.assertEqual(signature_codec.from_binary(transaction.binary_signature), transaction.signature)
+        self.assertEqual(signature_codec.encode(0), "0" * 36)
+        self.assertEqual(signature_codec.encode(36**36 - 1), "z" * 36)
+
+        self.assertEqual(signature_codec.decode("xxxab"), int("xxxab", 36))
+        self.assertEqual(signature_codec.from_binary(signature_codec.to_binary("xxxab")), "0" * 31 + "xxxab")
+        for invalid in ("ABC", " a_b ", "-1", "+1", "", "a" * 37, "\u0661"):
+            with self.assertRaises(ValueError):
+                signature_codec.decode(invalid)
+            with self.assertRaises(ValueError):
+                signature_codec.to_binary(invalid)
+            self.assertFalse(signature_codec.is_canonical(invalid))
+
+    def test_transaction_batch_feeds_line(self):
+        """
+        #name(TransactionBatch views can be processed by a ProcessingLine)
+        """
+        batch = TransactionBatch(UserRegistry())
+        batch.append(50, "alice", "bob")
+        batch.append(100, "bob", "dave")
+        batch.append(120, "alice", "bob")
+        batch.sign_all()
+        self.assertEqual(len(batch.registry), 3)
+        self.assertEqual(batch.from_user_id(0), batch.from_user_id(2))
+        self.assertEqual((batch.registry.hits, batch.registry.misses), (3, 3))
+
+        line = ProcessingLine(batch[1])
+        line.add_transaction(batch[2])
+        line.add_transaction(batch[0])
+
+        timestamps = []
+        for transaction in line:
+            expected = Transaction(transaction.timestamp, transaction.from_user, transaction.to_user)
+            expected.sign()
+            self.assertEqual(transaction.signature, expected.signature)
+            timestamps.append(transaction.timestamp)
+        self.assertEqual(timestamps, [50, 100, 120])
+
+        self.assertEqual(batch[-3].timestamp, 50)
+        for index in (3, -4):
+            with self.assertRaises(IndexError):
+                batch[index]
+
+        # signatures without a binary form are kept as they were added
+        signed = Transaction(7, "alice", "bob")
+        signed.sign()
+        by_hand = Transaction(8, "alice", "bob")
+        by_hand.signature = "abcde"
+        batch.add(signed)
+        batch.add(by_hand)
+        batch.append(9, "bob", "alice", "Not-A-Signature")
+        batch.append(10, "bob", "alice")
+        batch.sign_all()
+        self.assertEqual(
+            [batch[index].signature for index in range(3, 7)],
+            [signed.signature, "abcde", "Not-A-Signature", Transaction(10, "bob", "alice").signature],
+        )
+
+    def test_transaction_batch_views_share_the_batch_registry(self):
+        """
+        #name(Batch views reuse the batch's names and ids and decode signatures on use)
+        """
+        batch = TransactionBatch()
+        for index in range(100):
+            batch.append(index, f"sender{index % 10}", f"receiver{index}")
+        batch.sign_all()
+        users = len(batch.registry)
+        views = list(batch)
+        self.assertEqual(len(batch.registry), users)
+        self.assertEqual(batch.registry.misses, users)
+
+        view = views[7]
+        self.assertIs(view.from_user, batch.registry.name(batch.from_user_id(7)))
+        self.assertIs(view.registry, batch.registry)
+        self.assertEqual((view.from_user_id, view.to_user_id), (batch.from_user_id(7), batch.to_user_id(7)))
+        self.assertEqual(view.from_user_id, views[17].from_user_id)
+        self.assertTrue(view.is_signed)
+        self.assertIsNone(view._signature)
+        expected = Transaction(7, "sender7", "receiver7")
+        self.assertEqual(view.binary_signature, expected.binary_signature)
+        self.assertEqual(view.signature, expected.signature)
+
+        # a changed field drops the stored signature
+        view.timestamp = 8
+        self.assertFalse(view.is_signed)
+        self.assertEqual(view.signature, Transaction(8, view.from_user, view.to_user).signature)
+
+    def test_transaction_file_round_trip(self):
+        """
+        #name(Transactions written to a binary file read back the same)
+        """
+        transactions = [Transaction(10 * i, f"user{i % 3}", "bank") for i in range(10)]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "day.bntx")
+            self.assertEqual(write_transactions(path, transactions), 10)
+
+            with TransactionFile(path) as records:
+                self.assertEqual(len(records), 10)
+                self.assertEqual(records[-1].timestamp, 90)
+                for original, loaded in zip(transactions, records):
+                    self.assertEqual(
+                        (loaded.timestamp, loaded.from_user, loaded.to_user, loaded.signature),
+                        (original.timestamp, original.from_user, original.to_user, original.signature),
+                    )
+                chunks = [records[start:stop] for start, stop in records.chunk_bounds(3)]
+                self.assertEqual([len(chunk) for chunk in chunks], [4, 3, 3])
+                self.assertEqual([tx.timestamp for tx in chunks[1]], [40, 50, 60])
+
+    def test_transaction_file_reads_views(self):
+        """
+        #name(Records read from a file share its names, intern nothing and decode signatures on use)
+        """
+        registry = UserRegistry()
+        transactions = [Transaction(10 * i, f"user{i % 3}", "bank", registry) for i in range(1000)]
+        for transaction in transactions[:500]:
+            transaction.sign()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "day.bntx")
+            write_transactions(path, transactions)
+            users = len(registry)
+
+            with TransactionFile(path) as records:
+                loaded = list(records)
+                self.assertEqual(len(registry), users)
+                self.assertIs(loaded[0].from_user, loaded[3].from_user)
+                self.assertIs(loaded[0].to_user, loaded[999].to_user)
+                self.assertEqual((loaded[0].registry, loaded[0].from_user_id, loaded[0].to_user_id), (None, -1, -1))
+                self.assertTrue(loaded[7].is_signed)
+                self.assertIsNone(loaded[7]._signature)
+                self.assertEqual(loaded[7].binary_signature, transactions[7].binary_signature)
+                self.assertEqual(loaded[7].signature, transactions[7].signature)
+                self.assertFalse(loaded[700].is_signed)
+
+                # views written back out keep their signatures without being decoded
+                copy_path = os.path.join(directory, "copy.bntx")
+                write_transactions(copy_path, records)
+            with TransactionFile(copy_path) as copies:
+                self.assertEqual([tx.signature if tx.is_signed else None for tx in copies],
+                                 [tx.signature if tx.is_signed else None for tx in transactions])
+
+    def test_ingestion_feeds_line(self):
+        """
+        #name(CSV and JSON-lines rows can be streamed into a ProcessingLine)
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            csv_path = os.path.join(directory, "day.csv")
+            with open(csv_path, "w") as file:
+                file.write("from_user,to_user,timestamp,amount\nalice,bob,50,10\ndave,frank,120,\n")
+            jsonl_path = os.path.join(directory, "day.jsonl")
+            with open(jsonl_path, "w") as file:
+                file.write('{"timestamp": 100, "from_user": "bob", "to_user": "dave", "amount": 5}\n\n')
+
+            (critical, amount), = read_jsonl(jsonl_path)
+            self.assertEqual((critical.timestamp, critical.from_user, amount), (100, "bob", 5))
+
+            self.assertIsNotNone(critical.registry)
+
+            stats = IngestionStats()
+            registry = UserRegistry()
+            line = ProcessingLine(critical)
+            self.assertEqual(
+                ingest_into_line(read_csv(csv_path, buffer_size=8, stats=stats, registry=registry), line), 2
+            )
+            self.assertEqual(stats.rows, 2)
+            self.assertEqual(len(registry), 4)
+            self.assertEqual([tx.timestamp for tx in line], [50, 100, 120])
+
+    def test_ingestion_rejects_malformed_rows(self):
+        """
+        #name(A short CSV row or a JSON line that is not an object is a ValueError naming its line)
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            csv_path = os.path.join(directory, "short.csv")
+            with open(csv_path, "w") as file:
+                file.write("timestamp,from_user,to_user\n50,alice,bob\n60,alice\n")
+            with self.assertRaisesRegex(ValueError, r"short\.csv:3:"):
+                list(read_csv(csv_path))
+
+            jsonl_path = os.path.join(directory, "not_objects.jsonl")
+            with open(jsonl_path, "w") as file:
+                file.write('{"timestamp": 1, "from_user": "a", "to_user": "b"}\n\n[1, "a", "b"]\n')
+            with self.assertRaisesRegex(ValueError, r"not_objects\.jsonl:3:"):
+                list(read_jsonl(jsonl_path))
+
+    def test_ingestion_checks_field_types(self):
+        """
+        #name(Fractional, boolean or text-less fields are a ValueError naming their line, never truncated)
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            jsonl_path = os.path.join(directory, "types.jsonl")
+            good = '{"timestamp": 1, "from_user": "a", "to_user": "b", "amount": 2.0}\n'
+            for bad in (
+                '{"timestamp": 1.9, "from_user": "a", "to_user": "b"}',
+                '{"timestamp": 1, "from_user": "a", "to_user": "b", "amount": 2.7}',
+                '{"timestamp": true, "from_user": "a", "to_user": "b"}',
+                '{"timestamp": 1, "from_user": 5, "to_user": "b"}',
+                '{"timestamp": 1, "from_user": "a", "to_user": null}',
+            ):
+                with open(jsonl_path, "w") as file:
+                    file.write(good + bad + "\n")
+                with self.assertRaisesRegex(ValueError, r"types\.jsonl:2:"):
+                    list(read_jsonl(jsonl_path))
+            with open(jsonl_path, "w") as file:
+                file.write(good)
+            (transaction, amount), = read_jsonl(jsonl_path)
+            self.assertEqual((transaction.timestamp, amount), (1, 2))
+            self.assertIs(type(amount), int)
+
+            csv_path = os.path.join(directory, "types.csv")
+            with open(csv_path, "w") as file:
+                file.write("timestamp,from_user,to_user,amount\n50,alice,bob,1.9\n")
+            with self.assertRaisesRegex(ValueError, r"types\.csv:2: amount must be an integer"):
+                list(read_csv(csv_path))
+
 
 class TestTask1Approach(TestTask1Setup):
     def test_python_built_ins_not_used(self):
@@ -52,7 +979,9 @@ class TestTask1Approach(TestTask1Setup):
         #hurdle
         """
         import processing_line
-        modules = [processing_line]
+        import user_registry
+        from data_structures import hash_table_builtin_hash
+        modules = [processing_line, user_registry, hash_table_builtin_hash, signature_codec]
 
         for f in modules:
             # Get the source code
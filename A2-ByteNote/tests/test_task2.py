@@ -1,11 +1,13 @@
 from unittest import TestCase
 import ast
 import inspect
+import threading
 
 from tests.helper import CollectionsFinder
 
 from processing_line import Transaction
 from processing_book import ProcessingBook
+from radix_book import RadixProcessingBook
 
 from data_structures import ArrayR
 
@@ -26,8 +28,219 @@ class TestTask2(TestTask2Setup):
 
         book[transaction] = 100
         self.assertEqual(book[transaction], 100)
+
+    def test_page_index_table(self):
+        """
+        #name(Page index lookup matches the position in LEGAL_CHARACTERS)
+        """
+        book = ProcessingBook()
+        for position, character in enumerate(ProcessingBook.LEGAL_CHARACTERS):
+            self.assertEqual(book.page_index(character), position)
+        for character in ("A", "-", "\u00e9", "\u4e00"):
+            with self.assertRaises(ValueError):
+                book.page_index(character)
     
 
+    def test_radix_book_compresses_shared_prefixes(self):
+        """
+        #name(Radix book only branches where signatures differ)
+        """
+        signatures = ("x" * 30 + "aaaaaa", "x" * 30 + "aaaaab", "x" * 30 + "baaaaa", "abc123", "abcxyz")
+        transactions = []
+        for timestamp, signature in enumerate(signatures):
+            transaction = Transaction(timestamp, "s", "r")
+            transaction.signature = signature
+            transactions.append(transaction)
+
+        book, radix = ProcessingBook(), RadixProcessingBook()
+        for amount, transaction in enumerate(transactions):
+            book[transaction] = amount
+            radix[transaction] = amount
+        radix[transactions[0]] = 99
+        self.assertEqual((len(radix), radix.get_error_count()), (5, 1))
+        # top, the 30 x's, the 5 a's, and "abc"
+        self.assertEqual(radix.node_count(), 4)
+        self.assertEqual(
+            [(tx.signature, amount) for tx, amount in radix],
+            [(tx.signature, amount) for tx, amount in book],
+        )
+
+        del radix[transactions[2]]
+        del radix[transactions[3]]
+        self.assertEqual(radix.node_count(), 2)
+        with self.assertRaises(KeyError):
+            radix[transactions[2]]
+        self.assertEqual((radix[transactions[0]], radix[transactions[1]], radix[transactions[4]]), (0, 1, 4))
+
+    def test_radix_book_rejects_signature_without_splitting(self):
+        """
+        #name(A signature the radix book cannot store leaves every prefix as it was)
+        """
+        first, second, illegal = Transaction(1, "s", "r"), Transaction(2, "s", "r"), Transaction(3, "s", "r")
+        first.signature, second.signature = "x" * 10 + "a1", "x" * 10 + "b2"
+        illegal.signature = "xxxA" + "x" * 8
+
+        radix = RadixProcessingBook()
+        radix[first] = 1
+        radix[second] = 2
+        with self.assertRaises(ValueError):
+            radix[illegal] = 3
+        self.assertEqual((radix[first], radix[second]), (1, 2))
+        self.assertEqual((len(radix), radix.node_count()), (2, 2))
+
+    def test_storing_again_keeps_counts(self):
+        """
+        #name(Storing a transaction already in the book does not change any book's count)
+        """
+        first, second = Transaction(1, "s", "r"), Transaction(2, "s", "r")
+        first.signature, second.signature = "abc123", "abcxyz"
+        book = ProcessingBook()
+        book[first] = 10
+        book[second] = 20
+        page_a = book.page_index("a")
+        child = book.pages[page_a]
+        self.assertIsInstance(child, ProcessingBook)
+
+        # stored again through the child book, with the same amount and with another one
+        book[first] = 10
+        book[first] = 99
+        book[second] = 20
+        self.assertEqual((len(book), book.get_error_count()), (2, 1))
+        self.assertEqual((book.local_transactions, child.local_transactions), (2, 2))
+
+        # with the right counts, the child book collapses back into a leaf
+        del book[second]
+        self.assertEqual(book.pages[page_a], (first, 10))
+        self.assertEqual((len(book), book.local_transactions), (1, 1))
+
+    def test_failed_store_keeps_counts(self):
+        """
+        #name(A signature that cannot be stored or deleted leaves the book as it was)
+        """
+        def signed(signature):
+            transaction = Transaction(1, "s", "r")
+            transaction.signature = signature
+            return transaction
+
+        book = ProcessingBook()
+        first, second = signed("ab1"), signed("ab2")
+        book[first] = 1
+        book[second] = 2
+        page_a = book.page_index("a")
+        with self.assertRaises(ValueError):
+            book[signed("abZ")] = 3
+        with self.assertRaises(IndexError):
+            book[signed("ab")] = 3
+        with self.assertRaises(ValueError):
+            del book[signed("abZ")]
+        self.assertEqual((len(book), book.local_transactions), (2, 2))
+        self.assertEqual(book.pages[page_a].local_transactions, 2)
+
+        # a leaf that cannot be told apart from the new signature is not pushed down either
+        book[signed("x12")] = 4
+        with self.assertRaises(IndexError):
+            book[signed("x1")] = 5
+        self.assertEqual(book[signed("x12")], 4)
+        self.assertEqual((len(book), book.local_transactions), (3, 3))
+
+        del book[second]
+        self.assertEqual(book.pages[page_a], (first, 1))
+        self.assertEqual((len(book), book.local_transactions), (2, 2))
+
+    def test_from_sorted_matches_incremental(self):
+        """
+        #name(Book built from sorted pairs is the same as one built pair by pair)
+        """
+        signatures = ("abc123", "abcxyz", "0bbzzz", "abc12z", "abc123", "9aaaaa", "0bbzza", "abcxyz")
+        pairs = []
+        for timestamp, signature in enumerate(signatures):
+            transaction = Transaction(timestamp, "s", "r")
+            transaction.signature = signature
+            pairs.append((transaction, timestamp % 3))
+
+        book = ProcessingBook()
+        for transaction, amount in pairs:
+            book[transaction] = amount
+        ordered = [(transaction, amount) for transaction, amount in book]
+        for transaction, amount in pairs[4:]:
+            for index in range(len(ordered)):
+                if ordered[index][0].signature == transaction.signature:
+                    ordered.insert(index + 1, (transaction, amount))
+                    break
+
+        bulk = ProcessingBook.from_sorted(ordered)
+        self.assertEqual((len(bulk), bulk.get_error_count()), (len(book), book.get_error_count()))
+        self.assertEqual((len(bulk), bulk.get_error_count()), (6, 1))
+        self.assertEqual(
+            [(tx.signature, amount) for tx, amount in bulk],
+            [(tx.signature, amount) for tx, amount in book],
+        )
+        page_a = book.page_index("a")
+        self.assertEqual(bulk.local_transactions, book.local_transactions)
+        self.assertEqual(bulk.pages[page_a].local_transactions, book.pages[page_a].local_transactions)
+        self.assertEqual(bulk.pages[page_a].local_transactions, 3)
+
+        with self.assertRaises(ValueError):
+            ProcessingBook.from_sorted(ordered[::-1])
+
+    def test_operations_on_keys_deeper_than_recursion_limit(self):
+        """
+        #name(Book operations walk down in a loop, so very deep keys work)
+        """
+        shared = "a" * 2000
+        first, second = Transaction(1, "s", "r"), Transaction(2, "s", "r")
+        first.signature, second.signature = shared + "b", shared + "c"
+
+        book = ProcessingBook()
+        book[first] = 10
+        book[second] = 20
+        book[second] = 30
+        self.assertEqual((book[first], book[second]), (10, 20))
+        self.assertEqual((len(book), book.get_error_count()), (2, 1))
+        self.assertEqual(book.pages[book.page_index("a")].local_transactions, 2)
+
+        del book[first]
+        with self.assertRaises(KeyError):
+            del book[first]
+        slot = book.pages[book.page_index("a")]
+        self.assertIsInstance(slot, tuple)
+        self.assertEqual((slot[0].signature, slot[1], len(book)), (second.signature, 20, 1))
+
+    def test_independent_iterators_and_views(self):
+        """
+        #name(Several iterations over one book do not interfere)
+        """
+        book = ProcessingBook()
+        signatures = ("a11111", "abc123", "abcxyz", "z22222", "0bbzzz", "9")
+        for amount, signature in enumerate(signatures):
+            transaction = Transaction(amount, "s", "r")
+            transaction.signature = signature
+            book[transaction] = amount
+        expected = [("abcxyz", 2), ("abc123", 1), ("a11111", 0), ("z22222", 3), ("0bbzzz", 4), ("9", 5)]
+
+        first, second = iter(book), iter(book)
+        interleaved = []
+        for left, right in zip(first, second):
+            interleaved.append((left[0].signature, right[0].signature))
+        self.assertEqual(interleaved, [(signature, signature) for signature, _ in expected])
+        self.assertEqual([tx.signature for tx in book.pages[book.page_index("a")].keys()], ["abcxyz", "abc123", "a11111"])
+
+        self.assertEqual(len(book.items()), 6)
+        self.assertEqual([tx.signature for tx in book.keys()], [signature for signature, _ in expected])
+        self.assertEqual(list(book.values()), [amount for _, amount in expected])
+
+        results = [None] * 4
+
+        def read(slot):
+            results[slot] = [(tx.signature, amount) for tx, amount in book.items()]
+
+        readers = [threading.Thread(target=read, args=(slot,)) for slot in range(4)]
+        for reader in readers:
+            reader.start()
+        for reader in readers:
+            reader.join()
+        self.assertEqual(results, [expected] * 4)
+
 
 class TestTask2Approach(TestTask2Setup):
     def test_python_built_ins_not_used(self):
@@ -36,7 +249,9 @@ class TestTask2Approach(TestTask2Setup):
         #hurdle
         """
         import processing_book
-        modules = [processing_book]
+        import radix_book
+        import book_path
+        modules = [processing_book, radix_book, book_path]
 
         for f in modules:
             # Get the source code
@@ -0,0 +1,175 @@
+"""
+Columnar (struct-of-arrays) storage for large numbers of transactions.
+
+Instead of one Transaction object per record, a TransactionBatch keeps
+    - timestamps in an array('q'),
+    - sender and receiver as small int ids from a UserRegistry,
+    - signatures packed back to back in a bytearray, 24 bytes each (see signature_codec),
+      with a kind per record as in transaction_file: signatures computed by Transaction are
+      stored in their binary form, and any other string set by hand in a string table, its id
+      in the record's 24 bytes, so every signature reads back exactly as it was added.
+
+Records are read back as TransactionView objects built on demand, so a batch can be fed
+to ProcessingLine, ProcessingBook or FraudDetection without keeping every object alive.
+A view shares the batch registry's strings and ids instead of interning the names again,
+and decodes its signature only when it is read.
+"""
+from array import array
+
+from data_structures import ArrayR
+
+import signature_codec
+from user_registry import UserRegistry
+from processing_line import Transaction, _signature_value
+from transaction_file import BINARY_SIGNATURE, NO_SIGNATURE, TEXT_SIGNATURE, UNSIGNED, TransactionView
+
+
+class TransactionBatch:
+    """
+    Unless stated otherwise, all methods have O(1) complexity (amortised for appends).
+    """
+
+    def __init__(self, registry: UserRegistry | None = None) -> None:
+        """
+        :param registry: where user names are interned, defaults to a new registry of this batch.
+        """
+        self.__timestamps = array('q')
+        self.__from_ids = array('i')
+        self.__to_ids = array('i')
+        self.__signatures = bytearray()
+        self.__kinds = bytearray()
+        # Signatures that have no binary form, created on the first one
+        self.__texts = None
+        self.__registry = UserRegistry() if registry is None else registry
+
+    @classmethod
+    def from_transactions(cls, transactions, registry: UserRegistry | None = None) -> "TransactionBatch":
+        """
+        Build a batch from any iterable of Transaction, keeping their signatures.
+        :complexity: O(N * U), N is the number of transactions and U the cost of interning a user name.
+        """
+        batch = cls(registry)
+        for transaction in transactions:
+            batch.add(transaction)
+        return batch
+
+    def append(self, timestamp: int, from_user: str, to_user: str, signature: str | None = None) -> None:
+        """
+        Add one record. A signature, if given, is kept as it is: in its 24 byte form when it is
+        canonical (see signature_codec.is_canonical), otherwise in the batch's string table.
+        :complexity: O(U + L), U is the cost of interning both names and L the signature length.
+        """
+        self.__timestamps.append(timestamp)
+        self.__from_ids.append(self.__registry.intern(from_user))
+        self.__to_ids.append(self.__registry.intern(to_user))
+        if signature is None:
+            self.__signatures += NO_SIGNATURE
+            self.__kinds.append(UNSIGNED)
+        elif signature_codec.is_canonical(signature):
+            self.__signatures += signature_codec.to_binary(signature)
+            self.__kinds.append(BINARY_SIGNATURE)
+        else:
+            if self.__texts is None:
+                self.__texts = UserRegistry()
+            text_id = self.__texts.intern(signature)
+            self.__signatures += text_id.to_bytes(signature_codec.BINARY_LENGTH, "big")
+            self.__kinds.append(TEXT_SIGNATURE)
+
+    def add(self, transaction: Transaction) -> None:
+        """
+        Add a transaction, keeping its signature if it is already signed.
+        :complexity: See append.
+        """
+        signature = transaction.signature if transaction.is_signed else None
+        self.append(transaction.timestamp, transaction.from_user, transaction.to_user, signature)
+
+    def sign_all(self) -> None:
+        """
+        Sign every record that has no signature yet, writing the 24 byte form straight into the buffer.
+        :complexity: O(N * n), N is the number of records and n the cost of one signature.
+        """
+        width = signature_codec.BINARY_LENGTH
+        name = self.__registry.name
+        for index in range(len(self)):
+            if self.__kinds[index] != UNSIGNED:
+                continue
+            value = _signature_value(
+                self.__timestamps[index],
+                name(self.__from_ids[index]),
+                name(self.__to_ids[index]),
+            )
+            start = index * width
+            self.__signatures[start:start + width] = value.to_bytes(width, "big")
+            self.__kinds[index] = BINARY_SIGNATURE
+
+    def __getitem__(self, index: int) -> TransactionView:
+        """
+        Build a TransactionView of the record at index.
+        :raises IndexError: if index is out of range.
+        """
+        length = len(self)
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError("TransactionBatch index out of range.")
+        registry = self.__registry
+        from_id = self.__from_ids[index]
+        to_id = self.__to_ids[index]
+        kind = self.__kinds[index]
+        binary = None
+        if kind != UNSIGNED:
+            width = signature_codec.BINARY_LENGTH
+            start = index * width
+            binary = bytes(self.__signatures[start:start + width])
+        view = TransactionView(
+            self.__timestamps[index],
+            registry.name(from_id),
+            registry.name(to_id),
+            registry,
+            from_id,
+            to_id,
+            binary if kind == BINARY_SIGNATURE else None,
+        )
+        if kind == TEXT_SIGNATURE:
+            view.signature = self.__texts.name(int.from_bytes(binary, "big"))
+        return view
+
+    def __iter__(self):
+        """
+        Yield a TransactionView of every record, in insertion order.
+        :complexity: O(1) per record, O(N) overall.
+        """
+        for index in range(len(self)):
+            yield self[index]
+
+    def to_array(self) -> ArrayR[Transaction]:
+        """
+        Materialise the batch as an ArrayR of Transaction, e.g. for FraudDetection.
+        :complexity: O(N)
+        """
+        result = ArrayR(len(self))
+        for index in range(len(self)):
+            result[index] = self[index]
+        return result
+
+    @property
+    def registry(self) -> UserRegistry:
+        """ The registry the user ids of this batch refer to. """
+        return self.__registry
+
+    def from_user_id(self, index: int) -> int:
+        """ Sender id of the record at index, without building a view. """
+        return self.__from_ids[index]
+
+    def to_user_id(self, index: int) -> int:
+        """ Receiver id of the record at index, without building a view. """
+        return self.__to_ids[index]
+
+    def __len__(self) -> int:
+        return len(self.__timestamps)
+
+    def __str__(self) -> str:
+        return f"<TransactionBatch of {len(self)} transactions>"
+
+    def __repr__(self) -> str:
+        return str(self)
@@ -0,0 +1,328 @@
+"""
+Fixed-width binary file format for transactions, read back through mmap.
+
+Layout (all little-endian):
+    header   magic b"BNTX", version u16, reserved u16, record count u64, string table offset u64
+    records  one per transaction: timestamp i64, from id i32, to id i32,
+             signature kind u8, signature 24 bytes
+    strings  one per string id, in id order: byte length u32, UTF-8 bytes
+
+String ids are local to the file; user names are stored in the string table.
+A transaction's signature is saved as it is: signatures computed by Transaction are stored in
+their binary form (see signature_codec), any other string set by hand is stored in the string
+table (its id in the first 4 bytes of the signature field), and unsigned transactions stay
+unsigned, so writing a file never signs anything and reading one gives back the same signature.
+
+Because every record has the same width, record i lives at HEADER.size + i * RECORD.size:
+reading one is a single struct.unpack_from on the mapped file, and a file can be cut
+into ranges that worker processes open and read independently.
+"""
+import mmap
+import struct
+
+import signature_codec
+from data_structures import ArrayR
+from processing_line import Transaction
+from user_registry import UserRegistry
+
+MAGIC = b"BNTX"
+VERSION = 2
+HEADER = struct.Struct("<4sHHQQ")
+RECORD = struct.Struct(f"<qiiB{signature_codec.BINARY_LENGTH}s")
+STRING_LENGTH = struct.Struct("<I")
+STRING_ID = struct.Struct(f"<i{signature_codec.BINARY_LENGTH - 4}x")
+
+# Signature kinds of a record
+UNSIGNED = 0
+BINARY_SIGNATURE = 1
+TEXT_SIGNATURE = 2
+NO_SIGNATURE = bytes(signature_codec.BINARY_LENGTH)
+
+
+class TransactionView(Transaction):
+    """
+    A Transaction read from stored records. Its names and ids are taken as they are from the
+    registry (or string table) of the records, so nothing is interned again; without a registry
+    the ids are -1. A stored signature stays in its 24 byte form until it is read.
+    Setting a field works as on any Transaction and drops the stored signature.
+    """
+    __slots__ = ("_binary",)
+
+    def __init__(self, timestamp, from_user, to_user, registry=None, from_id=-1, to_id=-1, binary=None):
+        """
+        :param registry: the UserRegistry from_id and to_id refer to, or None.
+        :param binary: the signature in its 24 byte form, or None.
+        :complexity:
+            Best & Worst: O(1), nothing is interned or decoded.
+        """
+        self._timestamp = timestamp
+        self._from_user = from_user
+        self._to_user = to_user
+        self._registry = registry
+        self._from_id = from_id
+        self._to_id = to_id
+        self._signature = None
+        self._binary = binary
+
+    @Transaction.timestamp.setter
+    def timestamp(self, value):
+        Transaction.timestamp.fset(self, value)
+        self._binary = None
+
+    @Transaction.from_user.setter
+    def from_user(self, value):
+        Transaction.from_user.fset(self, value)
+        self._binary = None
+
+    @Transaction.to_user.setter
+    def to_user(self, value):
+        Transaction.to_user.fset(self, value)
+        self._binary = None
+
+    @property
+    def signature(self):
+        """
+        :complexity:
+            Best: O(1) when it is cached.
+            Worst: O(L) to decode the stored form, or O(n) when it must be computed.
+        """
+        if self._binary is not None:
+            self._signature = signature_codec.from_binary(self._binary)
+            self._binary = None
+        return Transaction.signature.fget(self)
+
+    @signature.setter
+    def signature(self, value):
+        self._binary = None
+        self._signature = value
+
+    @property
+    def is_signed(self):
+        return self._binary is not None or self._signature is not None
+
+    @property
+    def binary_signature(self):
+        """
+        :complexity:
+            Best: O(1) when the stored form was not decoded.
+            Worst: see Transaction.binary_signature.
+        """
+        if self._binary is not None:
+            return self._binary
+        return Transaction.binary_signature.fget(self)
+
+    def sign(self):
+        self._binary = None
+        Transaction.sign(self)
+
+
+class TransactionFileWriter:
+    """
+    Writes transactions to a new file. Use as a context manager, or call close() at the end:
+    the string table and the header are only written then.
+    """
+
+    def __init__(self, path) -> None:
+        self.__file = open(path, "wb")
+        self.__strings = UserRegistry()
+        self.__count = 0
+        self.__file.write(HEADER.pack(MAGIC, VERSION, 0, 0, 0))
+
+    def write(self, transaction: Transaction) -> None:
+        """
+        Append one transaction with its signature as it is, without signing it.
+        :complexity: O(U + L), U is the cost of interning both names and L the length of the signature.
+        """
+        if not transaction.is_signed:
+            kind, signature = UNSIGNED, NO_SIGNATURE
+        elif type(transaction) is TransactionView and transaction._binary is not None:
+            # read from a file or batch and never decoded: copy the stored form as it is
+            kind, signature = BINARY_SIGNATURE, transaction._binary
+        elif signature_codec.is_canonical(transaction.signature):
+            kind, signature = BINARY_SIGNATURE, transaction.binary_signature
+        else:
+            kind, signature = TEXT_SIGNATURE, STRING_ID.pack(self.__strings.intern(transaction.signature))
+        self.__file.write(RECORD.pack(
+            transaction.timestamp,
+            self.__strings.intern(transaction.from_user),
+            self.__strings.intern(transaction.to_user),
+            kind,
+            signature,
+        ))
+        self.__count += 1
+
+    def write_all(self, transactions) -> None:
+        """
+        :complexity: O(N) calls to write.
+        """
+        for transaction in transactions:
+            self.write(transaction)
+
+    def close(self) -> None:
+        """
+        Write the string table, fill in the header and close the file.
+        :complexity: O(U), U is the total length of the strings.
+        """
+        if self.__file.closed:
+            return
+        strings_offset = self.__file.tell()
+        for string_id in range(len(self.__strings)):
+            encoded = self.__strings.name(string_id).encode("utf-8")
+            self.__file.write(STRING_LENGTH.pack(len(encoded)))
+            self.__file.write(encoded)
+        self.__file.seek(0)
+        self.__file.write(HEADER.pack(MAGIC, VERSION, 0, self.__count, strings_offset))
+        self.__file.close()
+
+    def __len__(self) -> int:
+        return self.__count
+
+    def __enter__(self) -> "TransactionFileWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def write_transactions(path, transactions) -> int:
+    """
+    Write an iterable of transactions to a new file and return how many were written.
+    """
+    with TransactionFileWriter(path) as writer:
+        writer.write_all(transactions)
+        return len(writer)
+
+
+class TransactionFile:
+    """
+    Read-only, memory-mapped view of a transaction file, or of a range of its records.
+    Records are decoded on access into TransactionView objects, which take their names from the
+    file's string table as they are (their user ids are -1) and decode a signature only when it
+    is read; the file contents are never copied as a whole.
+
+    Unless stated otherwise, all methods have O(1) complexity.
+    """
+
+    def __init__(self, path) -> None:
+        """
+        Map the file and load its string table.
+        :raises ValueError: if the file is not a transaction file of a known version.
+        :complexity: O(U), U is the total length of the strings.
+        """
+        with open(path, "rb") as file:
+            self.__map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, count, strings_offset = HEADER.unpack_from(self.__map, 0)
+        if magic != MAGIC or version != VERSION:
+            self.__map.close()
+            raise ValueError(f"{path} is not a version {VERSION} transaction file.")
+        self.__path = path
+        self.__strings = self.__read_strings(strings_offset)
+        self.__start = 0
+        self.__stop = count
+
+    def __read_strings(self, offset: int) -> ArrayR[str]:
+        """
+        Read the string table starting at offset into an ArrayR, in id order.
+        The table is walked once to count the strings (only their lengths are read), then once
+        to decode them.
+        :complexity: O(U), U is the total length of the strings.
+        """
+        data = self.__map
+        count = 0
+        position = offset
+        while position < len(data):
+            (length,) = STRING_LENGTH.unpack_from(data, position)
+            position += STRING_LENGTH.size + length
+            count += 1
+        strings = ArrayR(count)
+        for string_id in range(count):
+            (length,) = STRING_LENGTH.unpack_from(data, offset)
+            offset += STRING_LENGTH.size
+            strings[string_id] = str(data[offset:offset + length], "utf-8")
+            offset += length
+        return strings
+
+    @property
+    def path(self):
+        return self.__path
+
+    def __record(self, position: int) -> TransactionView:
+        """
+        Decode the record at an absolute position in the file into a TransactionView that shares
+        the names of the string table and keeps a binary signature undecoded.
+        """
+        timestamp, from_id, to_id, kind, signature = RECORD.unpack_from(
+            self.__map, HEADER.size + position * RECORD.size
+        )
+        strings = self.__strings
+        transaction = TransactionView(
+            timestamp, strings[from_id], strings[to_id], binary=signature if kind == BINARY_SIGNATURE else None
+        )
+        if kind == TEXT_SIGNATURE:
+            transaction.signature = strings[STRING_ID.unpack(signature)[0]]
+        return transaction
+
+    def __getitem__(self, index):
+        """
+        An int gives the TransactionView at that record number (relative to this range).
+        A slice (step 1 only) gives a TransactionFile over that range, sharing the same mapping.
+        :raises IndexError: if the record number is out of range.
+        """
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                raise ValueError("Only contiguous ranges of records can be taken.")
+            view = object.__new__(TransactionFile)
+            view.__map = self.__map
+            view.__path = self.__path
+            view.__strings = self.__strings
+            view.__start = self.__start + start
+            view.__stop = self.__start + max(start, stop)
+            return view
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("Record number out of range.")
+        return self.__record(self.__start + index)
+
+    def __iter__(self):
+        """
+        Yield every record in this range, in file order.
+        :complexity: O(1) per record, O(N) overall.
+        """
+        for position in range(self.__start, self.__stop):
+            yield self.__record(position)
+
+    def chunk_bounds(self, chunk_count: int):
+        """
+        Yield (start, stop) record numbers splitting this range into chunk_count nearly equal parts.
+        Workers can open the file themselves and read file[start:stop].
+        :complexity: O(chunk_count)
+        """
+        if chunk_count <= 0:
+            raise ValueError("chunk_count must be positive.")
+        size, extra = divmod(len(self), chunk_count)
+        start = 0
+        for chunk in range(chunk_count):
+            stop = start + size + (1 if chunk < extra else 0)
+            yield start, stop
+            start = stop
+
+    def close(self) -> None:
+        """ Unmap the file. Every range taken from this file becomes unusable. """
+        self.__map.close()
+
+    def __enter__(self) -> "TransactionFile":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.__stop - self.__start
+
+    def __str__(self) -> str:
+        return f"<TransactionFile {self.__path} records [{self.__start}, {self.__stop})>"
+
+    def __repr__(self) -> str:
+        return str(self)
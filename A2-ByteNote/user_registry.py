@@ -0,0 +1,174 @@
+"""
+Interning of user names.
+
+Transactions come from a small population of accounts, so every name is stored
+once and handed out as a small int id or as the one shared string object.
+Comparing shared strings is an identity check, and comparing ids is an int compare.
+
+There is no process-wide registry: each one belongs to a scope, such as a TransactionBatch,
+a file being written, one ingestion run, or whatever the caller passes to Transaction, and its
+names are freed together with it. Ids only compare within one registry.
+"""
+import threading
+
+from data_structures.hash_table_builtin_hash import BuiltinHashTable
+from data_structures.referential_array import ArrayR
+
+# Room for this many names before the array of names is first doubled
+INITIAL_CAPACITY = 16
+
+
+class UserRegistry:
+    """
+    Two-way table between user names and small int ids (0, 1, 2, ... in order of first use).
+    Names are found in a hash table of name -> id, and ids in an ArrayR of names.
+    Unless stated otherwise, all methods have O(1) complexity (plus hashing the name),
+    amortised over the doubling of the array of names.
+    Registering names is safe from several threads: a lock makes sure each name gets one id.
+    Names already registered are looked up by intern_pair without the lock (see BuiltinHashTable).
+    """
+
+    def __init__(self, capacity: int | None = None) -> None:
+        """
+        :param capacity: most names to hold, or None for no limit.
+        :raises ValueError: if capacity is not positive.
+        """
+        if capacity is not None and capacity <= 0:
+            raise ValueError("Capacity must be positive.")
+        self.__capacity = capacity
+        self.__lock = threading.Lock()
+        self.__ids = BuiltinHashTable()
+        self.__names = ArrayR(INITIAL_CAPACITY)
+        self.__count = 0
+        self.__hits = 0
+        self.__misses = 0
+
+    def intern(self, name: str) -> int:
+        """
+        Return the id of name, registering it if it has not been seen before.
+        :raises RuntimeError: if name is new and the registry is full.
+        """
+        with self.__lock:
+            return self.__intern(name)
+
+    def intern_pair(self, first: str, second: str) -> tuple:
+        """
+        Register two names with one turn of the lock, e.g. the sender and receiver of a transaction.
+        When both are registered already, they are only looked up, without taking the lock. Their
+        hits are counted without it too, so a few may be lost while threads intern at the same time.
+        :return: (first id, shared first name, second id, shared second name).
+        :raises RuntimeError: if the registry has no room for the new names; neither is registered.
+        """
+        find = self.__ids.find
+        first_id = find(first, -1)
+        second_id = find(second, -1)
+        if first_id >= 0 and second_id >= 0:
+            self.__hits += 2
+            # read after the ids: a name is in the array before its id is in the table
+            names = self.__names.array
+            return first_id, names[first_id], second_id, names[second_id]
+        with self.__lock:
+            if self.__capacity is not None:
+                # both or neither: check for room before registering the first name
+                new = (first not in self.__ids) + (second != first and second not in self.__ids)
+                if self.__count + new > self.__capacity:
+                    self.__raise_full()
+            first_id = self.__intern(first)
+            second_id = self.__intern(second)
+            names = self.__names.array
+            return first_id, names[first_id], second_id, names[second_id]
+
+    def __intern(self, name: str) -> int:
+        """
+        intern, for callers that hold the lock.
+        """
+        user_id = self.__ids.find(name, -1)
+        if user_id < 0:
+            if self.__count == self.__capacity:
+                self.__raise_full()
+            self.__misses += 1
+            user_id = self.__count
+            if user_id == len(self.__names):
+                self.__names = _doubled(self.__names)
+            # the name is in the array before its id can be handed out
+            self.__names.array[user_id] = name
+            self.__ids[name] = user_id
+            self.__count = user_id + 1
+        else:
+            self.__hits += 1
+        return user_id
+
+    def __raise_full(self) -> None:
+        raise RuntimeError(f"UserRegistry is full ({self.__capacity} names).")
+
+    def canonical(self, name: str) -> str:
+        """
+        Return the shared string object for name, registering it if needed.
+        :raises RuntimeError: if name is new and the registry is full.
+        """
+        return self.__names[self.intern(name)]
+
+    def name(self, user_id: int) -> str:
+        """
+        :raises IndexError: if no user has this id.
+        """
+        if not 0 <= user_id < self.__count:
+            raise IndexError("No user has this id.")
+        return self.__names[user_id]
+
+    def id_of(self, name: str) -> int:
+        """
+        Look up the id of a registered name, without registering it or counting a hit.
+        :raises KeyError: if the name has not been registered.
+        """
+        return self.__ids[name]
+
+    @property
+    def hits(self) -> int:
+        """ Number of intern/canonical calls for names that were already registered. """
+        return self.__hits
+
+    @property
+    def misses(self) -> int:
+        """ Number of intern/canonical calls that registered a new name. """
+        return self.__misses
+
+    @property
+    def capacity(self) -> int | None:
+        """ Most names the registry holds, None if there is no limit. """
+        return self.__capacity
+
+    def clear(self) -> None:
+        """
+        Forget every name and reset the counters.
+        Ids handed out before are no longer valid.
+        """
+        with self.__lock:
+            self.__ids = BuiltinHashTable()
+            self.__names = ArrayR(INITIAL_CAPACITY)
+            self.__count = 0
+            self.__hits = 0
+            self.__misses = 0
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.__ids
+
+    def __len__(self) -> int:
+        return self.__count
+
+    def __str__(self) -> str:
+        return f"<UserRegistry of {len(self)} users, {self.__hits} hits, {self.__misses} misses>"
+
+    def __repr__(self) -> str:
+        return str(self)
+
+
+def _doubled(names: ArrayR) -> ArrayR:
+    """
+    Return an ArrayR twice as long as names, starting with its items.
+    :complexity: O(N), N = len(names).
+    """
+    bigger = ArrayR(2 * len(names))
+    bigger.array[:len(names)] = names.array[:]
+    return bigger
+